@@ -1,12 +1,16 @@
 """Core PydanticAI agent and analysis logic for AI Stock Analyst."""
 
 import asyncio
+import functools
 import re
-from typing import List, Literal, Optional
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Literal, Optional, Tuple
 from datetime import datetime
 import os
 
 import logfire
+import numpy as np
 from pydantic_ai import Agent, RunContext
 
 from .models import UserProfile, RequestType, DetailedStockData, StockDataPoint
@@ -16,22 +20,293 @@ from .csv_tool import (
     get_daily_stock_csv, 
     get_intraday_stock_csv, 
     get_weekly_stock_csv, 
-    analyze_csv_data
+    analyze_csv_data,
+    close_session
 )
 
+# Filename reported by save_csv_to_file in the agent output
+_CSV_SAVED_RE = re.compile(r"CSV data saved to:\s*(\S+)")
+
+# Shared profile for calls without a user; agents only read deps, never mutate them
+_DEFAULT_PROFILE = UserProfile()
+
+# Max number of symbols fetched from the MCP server at the same time
+_MCP_FETCH_CONCURRENCY = 8
+
+# Max number of classified requests remembered by AIStockAnalyst.classify_request
+_CLASSIFY_CACHE_SIZE = 1024
+# Classifications below this confidence are not cached
+_CLASSIFY_CACHE_MIN_CONFIDENCE = 0.7
+
+def _write_bytes_file(filename: str, content: bytes) -> None:
+    """Blocking file write; call through asyncio.to_thread from async code."""
+    with open(filename, 'wb') as f:
+        f.write(content)
+
+
+def _write_text_file(filename: str, content: str) -> None:
+    """Blocking file write; call through asyncio.to_thread from async code."""
+    # Encode once and write bytes directly, skipping the text-mode codec layer
+    _write_bytes_file(filename, content.encode('utf-8'))
+
+
+# [epoch second, formatted timestamp, files already named in that second]
+_last_file_timestamp = [-1, "", 0]
+
+
+def _file_timestamp() -> str:
+    """
+    YYYYmmdd_HHMMSS timestamp for export filenames.
+    
+    The formatted string is reused within the same second, and repeat calls in
+    that second get a _1, _2, ... suffix so quick successive saves don't collide.
+    """
+    now = int(time.time())
+    if now != _last_file_timestamp[0]:
+        _last_file_timestamp[:] = [now, time.strftime("%Y%m%d_%H%M%S", time.localtime(now)), 0]
+        return _last_file_timestamp[1]
+    _last_file_timestamp[2] += 1
+    return f"{_last_file_timestamp[1]}_{_last_file_timestamp[2]}"
+
+
+_OHLCV_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+def _is_date_token(token: str) -> bool:
+    """Cheap check for a YYYY-MM-DD prefix without going through the regex engine."""
+    return (
+        len(token) >= 10
+        and token[4] == '-' and token[7] == '-'
+        and token[:4].isdigit() and token[5:7].isdigit() and token[8:10].isdigit()
+    )
+
+
+def _is_time_token(token: str) -> bool:
+    """Cheap check for an HH:MM:SS prefix."""
+    return (
+        len(token) >= 8
+        and token[2] == ':' and token[5] == ':'
+        and token[:2].isdigit() and token[3:5].isdigit() and token[6:8].isdigit()
+    )
+
+
+def _iter_ohlcv(text: str) -> Iterator[Tuple[str, str, str, str, str, str]]:
+    """
+    Yield (datetime, open, high, low, close, volume) string tuples from MCP output.
+    
+    Handles both formats the MCP server produces in one forward pass:
+    single-line  2025-06-06: Open: 203.0000 High: 205.7000 ...
+    multi-line   2025-06-06:\n  Open: 203.0000\n  High: 205.7000 ...
+    A date-prefixed line starts a new record; labeled values on the same
+    or following lines fill it in. Only complete records are yielded.
+    """
+    date_str = None
+    current = {}
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+        
+        start = 0
+        if _is_date_token(tokens[0]):
+            if date_str is not None and len(current) == len(_OHLCV_FIELDS):
+                yield (date_str, current["Open"], current["High"], current["Low"],
+                       current["Close"], current["Volume"])
+            date_str = tokens[0][:10]
+            current = {}
+            start = 1
+            if len(tokens) > 1 and _is_time_token(tokens[1]):
+                date_str = f"{date_str} {tokens[1][:8]}"
+                start = 2
+        
+        if date_str is None:
+            continue
+        
+        for j in range(start, len(tokens) - 1):
+            label = tokens[j]
+            if label.endswith(':') and label[:-1] in _OHLCV_FIELDS:
+                current[label[:-1]] = tokens[j + 1]
+    
+    if date_str is not None and len(current) == len(_OHLCV_FIELDS):
+        yield (date_str, current["Open"], current["High"], current["Low"],
+               current["Close"], current["Volume"])
+
+
+# --- Alpha Vantage CSV tools, shared by AIStockAnalyst.agent and .csv_agent ---
+
+# Max characters of raw CSV echoed back to the model
+_CSV_PREVIEW_CHARS = 1000
+
+
+def _csv_preview(csv_data: str, max_chars: int = _CSV_PREVIEW_CHARS) -> str:
+    """Return the first rows of csv_data, cut at a line boundary within max_chars."""
+    if len(csv_data) <= max_chars:
+        return csv_data
+    cut = csv_data.rfind('\n', 0, max_chars)
+    return csv_data[:cut if cut > 0 else max_chars] + '\n...'
+
+
+async def _csv_tool_response(csv_data: str, symbol: str) -> str:
+    """Build the tool response: analysis plus a short preview, never the full CSV."""
+    # If it's valid CSV data, also provide analysis
+    if not csv_data.startswith("Error") and not csv_data.startswith("Rate limit"):
+        analysis = await analyze_csv_data(csv_data, symbol)
+        return f"{analysis}\n\n📄 **Raw CSV Data**:\n```csv\n{_csv_preview(csv_data)}\n```"
+    else:
+        return csv_data
+
+
+async def get_stock_csv_daily(ctx: RunContext[UserProfile], symbol: str, adjusted: bool = True) -> str:
+    """
+    Get daily stock data from Alpha Vantage as CSV format.
+    
+    Args:
+        symbol: Stock symbol (e.g., 'AAPL', 'GOOGL')
+        adjusted: Whether to get adjusted prices (default: True)
+    
+    Returns CSV data that can be saved or analyzed.
+    """
+    logfire.info(f"Fetching daily CSV data for {symbol}")
+    csv_data = await get_daily_stock_csv(symbol, adjusted)
+    
+    return await _csv_tool_response(csv_data, symbol)
+
+
+async def get_stock_csv_intraday(
+    ctx: RunContext[UserProfile], 
+    symbol: str,
+    interval: Literal["1min", "5min", "15min", "30min", "60min"] = "5min",
+    month: Optional[str] = None
+) -> str:
+    """
+    Get intraday stock data from Alpha Vantage as CSV format.
+    
+    Args:
+        symbol: Stock symbol (e.g., 'AAPL', 'GOOGL')
+        interval: Time interval (1min, 5min, 15min, 30min, 60min)
+        month: Optional month in YYYY-MM format for historical data
+    
+    Returns CSV data that can be saved or analyzed.
+    """
+    logfire.info(f"Fetching intraday CSV data for {symbol} ({interval})")
+    csv_data = await get_intraday_stock_csv(symbol, interval, month)
+    
+    return await _csv_tool_response(csv_data, symbol)
+
+
+async def get_stock_csv_weekly(ctx: RunContext[UserProfile], symbol: str, adjusted: bool = True) -> str:
+    """
+    Get weekly stock data from Alpha Vantage as CSV format.
+    
+    Args:
+        symbol: Stock symbol (e.g., 'AAPL', 'GOOGL')
+        adjusted: Whether to get adjusted prices (default: True)
+    
+    Returns CSV data that can be saved or analyzed.
+    """
+    logfire.info(f"Fetching weekly CSV data for {symbol}")
+    csv_data = await get_weekly_stock_csv(symbol, adjusted)
+    
+    return await _csv_tool_response(csv_data, symbol)
+
+
+async def save_csv_to_file(ctx: RunContext[UserProfile], csv_data: str, symbol: str, data_type: str = "daily") -> str:
+    """
+    Save CSV data to a file.
+    
+    Args:
+        csv_data: The CSV data string to save
+        symbol: Stock symbol for filename
+        data_type: Type of data (daily, intraday, weekly) for filename
+    
+    Returns the filename where data was saved.
+    """
+    timestamp = _file_timestamp()
+    filename = f"{symbol}_{data_type}_data_{timestamp}.csv"
+    
+    try:
+        await asyncio.to_thread(_write_text_file, filename, csv_data)
+    
+        logfire.info(f"CSV file saved: {filename}")
+        return f"✅ CSV data saved to: {filename} ({len(csv_data)} characters)"
+    except Exception as e:
+        logfire.error(f"Failed to save CSV file: {e}")
+        return f"❌ Error saving CSV file: {str(e)}"
+
+
+@functools.lru_cache(maxsize=None)
+def _get_classifier_agent() -> Agent:
+    """Build the request classifier agent on first use; shared by all analysts."""
+    return Agent(
+        'anthropic:claude-3-5-sonnet-latest',
+        result_type=RequestType,
+        system_prompt=(
+            "You are a request classifier. Analyze user requests to determine if they want:"
+            "1. SPECIFIC detailed data (mentions: performance, data, movements, date range, CSV, export, detailed analysis, historical data, etc.)"
+            "2. GENERAL overview/summary (vague requests, general questions, quick info, latest data, overall view, etc.)"
+            
+            "SPECIFIC requests typically ask for:"
+            "- Historical data or date ranges"
+            "- Performance metrics"
+            "- Detailed movements or analysis"
+            "- Export or file requests"
+            "- Multiple data points"
+            
+            "GENERAL requests typically ask for:"
+            "- Overall consensus or opinion"
+            "- Latest/current info"
+            "- Quick summaries"
+            "- General market view"
+            "- Simple recommendations"
+        )
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_csv_agent() -> Agent:
+    """Build the CSV-only agent (no MCP) on first use; shared by all analysts."""
+    agent = Agent(
+        'anthropic:claude-3-5-sonnet-latest',
+        deps_type=UserProfile,
+        system_prompt=(
+            "You are an expert stock analyst with access to Alpha Vantage CSV tools.\n"
+            "Use these tools to get detailed stock data that can be exported:\n"
+            "- get_stock_csv_daily: Get daily stock data as CSV\n"
+            "- get_stock_csv_intraday: Get intraday data as CSV\n"
+            "- get_stock_csv_weekly: Get weekly data as CSV\n"
+            "- save_csv_to_file: Save CSV data to a file\n\n"
+            "Always use these tools to provide detailed analysis with exportable data."
+        )
+    )
+    
+    # Add the same CSV tools to the CSV-only agent
+    for tool in (get_stock_csv_daily, get_stock_csv_intraday, save_csv_to_file):
+        agent.tool(tool)
+    return agent
+
 
 class AIStockAnalyst:
     """Main application class for the AI Stock Analyst using PydanticAI."""
     
     def __init__(self):
-        # Set up MCP server
-        mcp_server = create_mcp_server()
+        # LRU cache of classification results keyed by normalized user input
+        self._classify_cache: "OrderedDict[str, RequestType]" = OrderedDict()
+        
+        # Set up MCP server; the session is started once and shared by all calls. It is
+        # entered and exited by one dedicated task, as its anyio task group requires.
+        self.mcp_server = create_mcp_server()
+        self._mcp_task: Optional[asyncio.Task] = None
+        self._mcp_ready: Optional[asyncio.Future] = None
+        self._mcp_stop = asyncio.Event()
+        
+        # Strong references to fire-and-forget prefetch tasks
+        self._prefetch_tasks = set()
         
         # Initialize AI Agent with simple system prompt
         self.agent = Agent(
             'anthropic:claude-3-5-sonnet-latest',
             deps_type=UserProfile,
-            mcp_servers=[mcp_server],
+            mcp_servers=[self.mcp_server],
             system_prompt=(
                 "You are an expert stock analyst with access to multiple data sources:\n"
                 "1. MCP tools for general stock data and alerts\n"
@@ -50,31 +325,6 @@ class AIStockAnalyst:
             )
         )
         
-        # Initialize classification agent for request type
-        self.classifier_agent = Agent(
-            'anthropic:claude-3-5-sonnet-latest',
-            result_type=RequestType,
-            system_prompt=(
-                "You are a request classifier. Analyze user requests to determine if they want:"
-                "1. SPECIFIC detailed data (mentions: performance, data, movements, date range, CSV, export, detailed analysis, historical data, etc.)"
-                "2. GENERAL overview/summary (vague requests, general questions, quick info, latest data, overall view, etc.)"
-                
-                "SPECIFIC requests typically ask for:"
-                "- Historical data or date ranges"
-                "- Performance metrics"
-                "- Detailed movements or analysis"
-                "- Export or file requests"
-                "- Multiple data points"
-                
-                "GENERAL requests typically ask for:"
-                "- Overall consensus or opinion"
-                "- Latest/current info"
-                "- Quick summaries"
-                "- General market view"
-                "- Simple recommendations"
-            )
-        )
-        
         # Add personalized system prompt
         @self.agent.system_prompt
         async def personalized_prompt(ctx: RunContext[UserProfile]) -> str:
@@ -88,170 +338,82 @@ class AIStockAnalyst:
             """
         
         # Add Alpha Vantage CSV tools
-        @self.agent.tool
-        async def get_stock_csv_daily(ctx: RunContext[UserProfile], symbol: str, adjusted: bool = True) -> str:
-            """
-            Get daily stock data from Alpha Vantage as CSV format.
-            
-            Args:
-                symbol: Stock symbol (e.g., 'AAPL', 'GOOGL')
-                adjusted: Whether to get adjusted prices (default: True)
-            
-            Returns CSV data that can be saved or analyzed.
-            """
-            logfire.info(f"Fetching daily CSV data for {symbol}")
-            csv_data = await get_daily_stock_csv(symbol, adjusted)
-            
-            # If it's valid CSV data, also provide analysis
-            if not csv_data.startswith("Error") and not csv_data.startswith("Rate limit"):
-                analysis = await analyze_csv_data(csv_data, symbol)
-                return f"{analysis}\n\n📄 **Raw CSV Data**:\n```csv\n{csv_data[:1000]}{'...' if len(csv_data) > 1000 else ''}\n```"
-            else:
-                return csv_data
-
-        @self.agent.tool
-        async def get_stock_csv_intraday(
-            ctx: RunContext[UserProfile], 
-            symbol: str,
-            interval: Literal["1min", "5min", "15min", "30min", "60min"] = "5min",
-            month: Optional[str] = None
-        ) -> str:
-            """
-            Get intraday stock data from Alpha Vantage as CSV format.
-            
-            Args:
-                symbol: Stock symbol (e.g., 'AAPL', 'GOOGL')
-                interval: Time interval (1min, 5min, 15min, 30min, 60min)
-                month: Optional month in YYYY-MM format for historical data
-            
-            Returns CSV data that can be saved or analyzed.
-            """
-            logfire.info(f"Fetching intraday CSV data for {symbol} ({interval})")
-            csv_data = await get_intraday_stock_csv(symbol, interval, month)
-            
-            # If it's valid CSV data, also provide analysis
-            if not csv_data.startswith("Error") and not csv_data.startswith("Rate limit"):
-                analysis = await analyze_csv_data(csv_data, symbol)
-                return f"{analysis}\n\n📄 **Raw CSV Data**:\n```csv\n{csv_data[:1000]}{'...' if len(csv_data) > 1000 else ''}\n```"
-            else:
-                return csv_data
-
-        @self.agent.tool
-        async def get_stock_csv_weekly(ctx: RunContext[UserProfile], symbol: str, adjusted: bool = True) -> str:
-            """
-            Get weekly stock data from Alpha Vantage as CSV format.
-            
-            Args:
-                symbol: Stock symbol (e.g., 'AAPL', 'GOOGL')
-                adjusted: Whether to get adjusted prices (default: True)
-            
-            Returns CSV data that can be saved or analyzed.
-            """
-            logfire.info(f"Fetching weekly CSV data for {symbol}")
-            csv_data = await get_weekly_stock_csv(symbol, adjusted)
-            
-            # If it's valid CSV data, also provide analysis
-            if not csv_data.startswith("Error") and not csv_data.startswith("Rate limit"):
-                analysis = await analyze_csv_data(csv_data, symbol)
-                return f"{analysis}\n\n📄 **Raw CSV Data**:\n```csv\n{csv_data[:1000]}{'...' if len(csv_data) > 1000 else ''}\n```"
-            else:
-                return csv_data
-
-        @self.agent.tool
-        async def save_csv_to_file(ctx: RunContext[UserProfile], csv_data: str, symbol: str, data_type: str = "daily") -> str:
-            """
-            Save CSV data to a file.
-            
-            Args:
-                csv_data: The CSV data string to save
-                symbol: Stock symbol for filename
-                data_type: Type of data (daily, intraday, weekly) for filename
-            
-            Returns the filename where data was saved.
-            """
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{symbol}_{data_type}_data_{timestamp}.csv"
-            
-            try:
-                with open(filename, 'w', newline='', encoding='utf-8') as f:
-                    f.write(csv_data)
-                
-                logfire.info(f"CSV file saved: {filename}")
-                return f"✅ CSV data saved to: {filename} ({len(csv_data)} characters)"
-            except Exception as e:
-                logfire.error(f"Failed to save CSV file: {e}")
-                return f"❌ Error saving CSV file: {str(e)}"
-
-        # Create a separate CSV-only agent for specific requests (no MCP)
-        self.csv_agent = Agent(
-            'anthropic:claude-3-5-sonnet-latest',
-            deps_type=UserProfile,
-            system_prompt=(
-                "You are an expert stock analyst with access to Alpha Vantage CSV tools.\n"
-                "Use these tools to get detailed stock data that can be exported:\n"
-                "- get_stock_csv_daily: Get daily stock data as CSV\n"
-                "- get_stock_csv_intraday: Get intraday data as CSV\n"
-                "- get_stock_csv_weekly: Get weekly data as CSV\n"
-                "- save_csv_to_file: Save CSV data to a file\n\n"
-                "Always use these tools to provide detailed analysis with exportable data."
-            )
-        )
+        for tool in (get_stock_csv_daily, get_stock_csv_intraday, get_stock_csv_weekly, save_csv_to_file):
+            self.agent.tool(tool)
         
-        # Add the same CSV tools to the CSV-only agent
-        @self.csv_agent.tool
-        async def get_stock_csv_daily(ctx: RunContext[UserProfile], symbol: str, adjusted: bool = True) -> str:
-            """Get daily stock data from Alpha Vantage as CSV format."""
-            logfire.info(f"Fetching daily CSV data for {symbol}")
-            csv_data = await get_daily_stock_csv(symbol, adjusted)
-            
-            if not csv_data.startswith("Error") and not csv_data.startswith("Rate limit"):
-                analysis = await analyze_csv_data(csv_data, symbol)
-                return f"{analysis}\n\n📄 **Raw CSV Data**:\n```csv\n{csv_data[:1000]}{'...' if len(csv_data) > 1000 else ''}\n```"
-            else:
-                return csv_data
-
-        @self.csv_agent.tool
-        async def get_stock_csv_intraday(
-            ctx: RunContext[UserProfile], 
-            symbol: str,
-            interval: Literal["1min", "5min", "15min", "30min", "60min"] = "5min",
-            month: Optional[str] = None
-        ) -> str:
-            """Get intraday stock data from Alpha Vantage as CSV format."""
-            logfire.info(f"Fetching intraday CSV data for {symbol} ({interval})")
-            csv_data = await get_intraday_stock_csv(symbol, interval, month)
-            
-            if not csv_data.startswith("Error") and not csv_data.startswith("Rate limit"):
-                analysis = await analyze_csv_data(csv_data, symbol)
-                return f"{analysis}\n\n📄 **Raw CSV Data**:\n```csv\n{csv_data[:1000]}{'...' if len(csv_data) > 1000 else ''}\n```"
-            else:
-                return csv_data
-
-        @self.csv_agent.tool
-        async def save_csv_to_file(ctx: RunContext[UserProfile], csv_data: str, symbol: str, data_type: str = "daily") -> str:
-            """Save CSV data to a file."""
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{symbol}_{data_type}_data_{timestamp}.csv"
-            
-            try:
-                with open(filename, 'w', newline='', encoding='utf-8') as f:
-                    f.write(csv_data)
-                
-                logfire.info(f"CSV file saved: {filename}")
-                return f"✅ CSV data saved to: {filename} ({len(csv_data)} characters)"
-            except Exception as e:
-                logfire.error(f"Failed to save CSV file: {e}")
-                return f"❌ Error saving CSV file: {str(e)}"
-
         logfire.info("AI Stock Analyst initialized with PydanticAI + Claude + Logfire + CSV Tools")
     
+    @property
+    def classifier_agent(self) -> Agent:
+        """Request classifier agent, built lazily on first classification."""
+        return _get_classifier_agent()
+    
+    @property
+    def csv_agent(self) -> Agent:
+        """CSV-only agent, built lazily on the first specific request."""
+        return _get_csv_agent()
+    
+    async def __aenter__(self) -> "AIStockAnalyst":
+        await self._ensure_mcp_servers()
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+    
+    async def _run_mcp_servers(self) -> None:
+        """Own the MCP server session: open it, report readiness, and hold it until aclose()."""
+        try:
+            async with self.agent.run_mcp_servers():
+                logfire.info("MCP server session started")
+                self._mcp_ready.set_result(None)
+                await self._mcp_stop.wait()
+            logfire.info("MCP server session stopped")
+        except BaseException as e:
+            if not self._mcp_ready.done():
+                self._mcp_ready.set_exception(e)
+            raise
+    
+    async def _ensure_mcp_servers(self) -> None:
+        """Start the MCP server session on first use and keep it open for later calls."""
+        # A finished task here means the session failed to start, so try again
+        if self._mcp_task is None or self._mcp_task.done():
+            self._mcp_ready = asyncio.get_running_loop().create_future()
+            self._mcp_task = asyncio.create_task(self._run_mcp_servers())
+        # shield: a cancelled caller must not cancel the shared startup
+        await asyncio.shield(self._mcp_ready)
+    
+    async def aclose(self) -> None:
+        """Stop the shared MCP server session and HTTP session, then clean up leftover tasks."""
+        task, self._mcp_task = self._mcp_task, None
+        try:
+            if task is not None:
+                self._mcp_stop.set()
+                await asyncio.gather(task, return_exceptions=True)
+                self._mcp_stop.clear()
+        finally:
+            await close_session()
+            await cleanup_tasks()
+    
     async def classify_request(self, user_input: str) -> RequestType:
         """Classify if user wants specific detailed data or general overview."""
+        cache_key = user_input.strip().lower()
+        cached = self._classify_cache.get(cache_key)
+        if cached is not None:
+            self._classify_cache.move_to_end(cache_key)
+            logfire.info(f"Request classification cache hit: {cached.request_type}")
+            return cached
+        
         try:
             result = await self.classifier_agent.run(
                 f"Classify this request: '{user_input}'"
             )
             logfire.info(f"Request classified as: {result.output.request_type}")
+            
+            # Only remember confident results so a bad guess doesn't stick
+            if result.output.confidence >= _CLASSIFY_CACHE_MIN_CONFIDENCE:
+                self._classify_cache[cache_key] = result.output
+                if len(self._classify_cache) > _CLASSIFY_CACHE_SIZE:
+                    self._classify_cache.popitem(last=False)
             return result.output
         except Exception as e:
             logfire.error(f"Request classification failed: {e}")
@@ -265,25 +427,18 @@ class AIStockAnalyst:
 
     def parse_mcp_data(self, mcp_output: str, symbol: str) -> DetailedStockData:
         """Parse MCP stock data output into structured format."""
-        data_points = []
-        
-        # Extract data lines using regex - handle both single-line and multi-line formats
-        # Single-line format: 2025-06-06: Open: 203.0000 High: 205.7000...
-        # Multi-line format: 2025-06-06:\n  Open: 203.0000\n  High: 205.7000...
+        # Single forward scan handles both single-line and multi-line formats
+        matches = list(_iter_ohlcv(mcp_output))
         
-        # First try single-line format
-        single_line_pattern = r'(\d{4}-\d{2}-\d{2}(?:\s+\d{2}:\d{2}:\d{2})?):?\s*Open:\s*([\d.]+)\s*High:\s*([\d.]+)\s*Low:\s*([\d.]+)\s*Close:\s*([\d.]+)\s*Volume:\s*([\d,]+)'
-        matches = re.findall(single_line_pattern, mcp_output)
+        # logfire templates are only formatted when the span is actually emitted
+        logfire.info("Raw MCP output preview: {preview}...", preview=mcp_output[:500])
+        logfire.info("Parsing MCP data for {symbol}, found {count} data points", symbol=symbol, count=len(matches))
         
-        # If no matches, try multi-line format (MCP server format)
-        if not matches:
-            multi_line_pattern = r'(\d{4}-\d{2}-\d{2}(?:\s+\d{2}:\d{2}:\d{2})?):[\s\S]*?Open:\s*([\d.]+)[\s\S]*?High:\s*([\d.]+)[\s\S]*?Low:\s*([\d.]+)[\s\S]*?Close:\s*([\d.]+)[\s\S]*?Volume:\s*([\d,]+)'
-            matches = re.findall(multi_line_pattern, mcp_output)
-        
-        logfire.info(f"Raw MCP output preview: {mcp_output[:500]}...")
-        logfire.info(f"Parsing MCP data for {symbol}, found {len(matches)} data points")
-        
-        previous_close = None
+        # Convert raw values into per-column lists first (struct-of-arrays).
+        # Columns are pre-sized to the match count and filled by index.
+        count = len(matches)
+        dates, opens, highs, lows, closes, volumes = ([None] * count for _ in range(6))
+        parsed = 0
         for i, match in enumerate(matches):
             try:
                 datetime_str, open_price, high_price, low_price, close_price, volume = match
@@ -294,50 +449,72 @@ class AIStockAnalyst:
                 low_val = float(low_price)
                 close_val = float(close_price)
                 volume_val = int(volume.replace(',', ''))  # Remove commas from volume
-                
-                # Calculate daily change if we have previous close
-                daily_change = None
-                daily_change_pct = None
-                if previous_close is not None:
-                    daily_change = close_val - previous_close
-                    daily_change_pct = (daily_change / previous_close) * 100
-                
-                data_point = StockDataPoint(
-                    date=datetime_str.strip(),  # Use the full datetime string
-                    symbol=symbol,
-                    open_price=open_val,
-                    high_price=high_val,
-                    low_price=low_val,
-                    close_price=close_val,
-                    volume=volume_val,
-                    daily_change=daily_change,
-                    daily_change_pct=daily_change_pct
-                )
-                data_points.append(data_point)
-                previous_close = close_val
-                
-                if i < 3:  # Log first few data points for debugging
-                    logfire.info(f"Parsed data point {i+1}: {datetime_str} - Close: {close_val}, Volume: {volume_val}")
-                    
             except Exception as e:
                 logfire.error(f"Error parsing data point {i+1}: {match} - {str(e)}")
                 continue
+            
+            dates[parsed] = datetime_str.strip()  # Use the full datetime string
+            opens[parsed] = open_val
+            highs[parsed] = high_val
+            lows[parsed] = low_val
+            closes[parsed] = close_val
+            volumes[parsed] = volume_val
+            parsed += 1
+            
+            if i < 3:  # Log first few data points for debugging
+                logfire.info(
+                    "Parsed data point {index}: {datetime} - Close: {close}, Volume: {volume}",
+                    index=i + 1, datetime=datetime_str, close=close_val, volume=volume_val
+                )
+        
+        # Drop the unused tail only if some matches failed to parse
+        if parsed < count:
+            for column in (dates, opens, highs, lows, closes, volumes):
+                del column[parsed:]
+        
+        # Daily change against the previous close, computed for all rows at once.
+        # The first row has no previous close and keeps None.
+        closes_np = np.asarray(closes, dtype=np.float64)
+        daily_changes = [None] * len(closes)
+        daily_change_pcts = [None] * len(closes)
+        if len(closes) > 1:
+            changes = np.diff(closes_np)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                change_pcts = changes / closes_np[:-1] * 100
+            daily_changes[1:] = changes.tolist()
+            daily_change_pcts[1:] = change_pcts.tolist()
+        
+        # Values were just parsed and converted above, so skip per-row validation
+        data_points = [
+            StockDataPoint.model_construct(
+                date=date,
+                symbol=symbol,
+                open_price=open_val,
+                high_price=high_val,
+                low_price=low_val,
+                close_price=close_val,
+                volume=volume_val,
+                daily_change=daily_change,
+                daily_change_pct=daily_change_pct
+            )
+            for date, open_val, high_val, low_val, close_val, volume_val, daily_change, daily_change_pct
+            in zip(dates, opens, highs, lows, closes, volumes, daily_changes, daily_change_pcts)
+        ]
         
         # Calculate summary stats
         if data_points:
-            closes = [dp.close_price for dp in data_points]
-            volumes = [dp.volume for dp in data_points]
+            volumes_np = np.asarray(volumes, dtype=np.int64)
             summary_stats = {
-                "avg_close": sum(closes) / len(closes),
-                "max_close": max(closes),
-                "min_close": min(closes),
-                "avg_volume": sum(volumes) / len(volumes),
+                "avg_close": float(closes_np.mean()),
+                "max_close": float(closes_np.max()),
+                "min_close": float(closes_np.min()),
+                "avg_volume": float(volumes_np.mean()),
                 "total_data_points": len(data_points)
             }
         else:
             summary_stats = {}
         
-        return DetailedStockData(
+        return DetailedStockData.model_construct(
             symbol=symbol,
             data_points=data_points,
             analysis_date=datetime.now().isoformat(),
@@ -351,19 +528,18 @@ class AIStockAnalyst:
             return "No data available to save"
             
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = _file_timestamp()
             filename = f"{data.symbol}_stock_data_{timestamp}.csv"
         
-        csv_content = data.to_csv()
+        csv_content = data.to_csv_bytes()
         
         try:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                f.write(csv_content)
+            await asyncio.to_thread(_write_bytes_file, filename, csv_content)
             logfire.info(f"CSV file saved: {filename} with {len(data.data_points)} data points")
             
             # Also log the first few lines for verification
-            lines = csv_content.split('\n')[:5]
-            logfire.info(f"CSV content preview: {lines}")
+            lines = [line.decode('utf-8') for line in csv_content.split(b'\n', 5)[:5]]
+            logfire.info("CSV content preview: {lines}", lines=lines)
             
             return filename
         except Exception as e:
@@ -388,22 +564,18 @@ class AIStockAnalyst:
             logfire.info(f"CSV result output length: {len(result.output)} characters")
             
             # For CSV tools, return the result directly (it already contains analysis + CSV file info)
-            response = f"""
-📊 **Detailed Analysis for {symbol}**
-{result.output}
-
-✅ **CSV Tools Used**: This analysis used Alpha Vantage CSV tools for direct data access.
-"""
+            response = "\n".join((
+                "",
+                f"📊 **Detailed Analysis for {symbol}**",
+                result.output,
+                "",
+                "✅ **CSV Tools Used**: This analysis used Alpha Vantage CSV tools for direct data access.",
+                "",
+            ))
             
             # Check if a CSV file was mentioned in the output
-            csv_file = ""
-            if "CSV data saved to:" in result.output:
-                # Extract filename from the output
-                lines = result.output.split('\n')
-                for line in lines:
-                    if "CSV data saved to:" in line:
-                        csv_file = line.split("CSV data saved to:")[1].split()[0]
-                        break
+            match = _CSV_SAVED_RE.search(result.output)
+            csv_file = match.group(1) if match else ""
             
             return response, csv_file
                 
@@ -419,18 +591,18 @@ class AIStockAnalyst:
         logfire.info(f"Handling general request for {symbol}")
         
         try:
-            async with self.agent.run_mcp_servers():
-                result = await asyncio.wait_for(
-                    self.agent.run(
-                        f"Analyze {symbol} stock. Call get-daily-stock-data for {symbol} and provide a brief summary.",
-                        deps=profile,
-                        model_settings={'max_tokens': 1000}
-                    ),
-                    timeout=60  # 1 minute timeout for general analysis
-                )
-                
-                return result.output
-                
+            await self._ensure_mcp_servers()
+            result = await asyncio.wait_for(
+                self.agent.run(
+                    f"Analyze {symbol} stock. Call get-daily-stock-data for {symbol} and provide a brief summary.",
+                    deps=profile,
+                    model_settings={'max_tokens': 1000}
+                ),
+                timeout=60  # 1 minute timeout for general analysis
+            )
+            
+            return result.output
+            
         except asyncio.TimeoutError:
             logfire.error(f"General request timed out for {symbol}")
             return f"⏰ Analysis for {symbol} timed out. Please try again."
@@ -438,8 +610,20 @@ class AIStockAnalyst:
             logfire.error(f"General request failed for {symbol}: {e}")
             return f"❌ Analysis failed for {symbol}: {str(e)}"
 
+    async def _prefetch(self, symbol: str) -> None:
+        """Warm the daily CSV cache; failures are left to the real call."""
+        try:
+            await get_daily_stock_csv(symbol)
+        except Exception as e:
+            logfire.warning(f"Prefetch for {symbol} failed: {e}")
+    
     async def smart_analyze(self, user_input: str, symbol: str, profile: UserProfile) -> tuple[str, str]:
         """Smart analysis that handles both specific and general requests."""
+        # Start fetching data for either path while the request is classified
+        prefetch = asyncio.create_task(self._prefetch(symbol))
+        self._prefetch_tasks.add(prefetch)
+        prefetch.add_done_callback(self._prefetch_tasks.discard)
+        
         # Classify the request
         request_type = await self.classify_request(user_input)
         
@@ -457,69 +641,147 @@ class AIStockAnalyst:
         logfire.info(f"Starting analysis for {symbol} - User: {profile.name}")
         
         try:
-            async with self.agent.run_mcp_servers():
-                result = await asyncio.wait_for(
-                    self.agent.run(
-                        f"""
-                        Please analyze {symbol} stock. Start by calling get-daily-stock-data with symbol="{symbol}" to get the current price and data.
-                        Then provide a brief analysis including:
-                        - Current price and recent performance
-                        - Buy/hold/sell recommendation for {profile.risk_tolerance} risk tolerance
-                        - Key insights for {profile.investment_horizon} investment horizon
-                        """,
-                        deps=profile,
-                        model_settings={'max_tokens': 1500}
-                    ),
-                    timeout=timeout
-                )
-                
-                logfire.info(f"Analysis completed for {symbol}")
-                return result.output
-                
+            await self._ensure_mcp_servers()
+            result = await asyncio.wait_for(
+                self.agent.run(
+                    f"""
+                    Please analyze {symbol} stock. Start by calling get-daily-stock-data with symbol="{symbol}" to get the current price and data.
+                    Then provide a brief analysis including:
+                    - Current price and recent performance
+                    - Buy/hold/sell recommendation for {profile.risk_tolerance} risk tolerance
+                    - Key insights for {profile.investment_horizon} investment horizon
+                    """,
+                    deps=profile,
+                    model_settings={'max_tokens': 1500}
+                ),
+                timeout=timeout
+            )
+            
+            logfire.info(f"Analysis completed for {symbol}")
+            return result.output
+            
         except asyncio.TimeoutError:
             logfire.error(f"Analysis timed out for {symbol}")
             return f"⏰ Analysis for {symbol} timed out. Please try again with a shorter analysis or check your connection."
         except Exception as e:
             logfire.error(f"Analysis failed for {symbol}: {e}")
             return f"❌ Analysis failed for {symbol}: {str(e)}"
-        finally:
-            await cleanup_tasks()
     
-    async def compare_stocks(self, symbols: List[str], profile: UserProfile) -> str:
-        """Compare multiple stocks and provide portfolio recommendations."""
-        logfire.info(f"Comparing stocks: {', '.join(symbols)} for user: {profile.name}")
+    async def _fetch_symbol(
+        self, symbol: str, semaphore: asyncio.Semaphore, include_intraday: bool = False
+    ) -> dict:
+        """Call the MCP data tools for one symbol directly, without going through the LLM."""
+        tool_calls = {
+            "daily": ("get-daily-stock-data", {"symbol": symbol}),
+            "alerts": ("get-stock-alerts", {"symbol": symbol}),
+        }
+        if include_intraday:
+            tool_calls["intraday"] = ("get-stock-data", {"symbol": symbol, "interval": "5min"})
+        
+        async def call(tool_name: str, args: dict) -> str:
+            try:
+                return str(await self.mcp_server.call_tool(tool_name, args))
+            except Exception as e:
+                logfire.error(f"MCP tool {tool_name} failed for {symbol}: {e}")
+                return f"Error: {str(e)}"
+        
+        async with semaphore:
+            results = await asyncio.gather(*(call(name, args) for name, args in tool_calls.values()))
+        
+        return {"symbol": symbol, **dict(zip(tool_calls, results))}
+    
+    async def _fetch_symbols(self, symbols: List[str], include_intraday: bool = False) -> str:
+        """Fetch MCP data for all symbols concurrently and format it for a single prompt."""
+        semaphore = asyncio.Semaphore(_MCP_FETCH_CONCURRENCY)
+        fetched = await asyncio.gather(
+            *(self._fetch_symbol(symbol, semaphore, include_intraday) for symbol in symbols)
+        )
+        
+        sections = []
+        for data in fetched:
+            lines = [f"### {data['symbol']}"]
+            for key, value in data.items():
+                if key != "symbol":
+                    lines.append(f"{key.capitalize()} data:\n{value}")
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections)
+    
+    async def buffered_analyze(self, symbols: List[str], profile: UserProfile, timeout: int = 120) -> str:
+        """Analyze a batch of stocks with one LLM call over the shared MCP session."""
+        logfire.info(f"Buffered analysis for {', '.join(symbols)} - User: {profile.name}")
         
         try:
-            async with self.agent.run_mcp_servers():
-                result = await self.agent.run(
+            await self._ensure_mcp_servers()
+            stock_data = await self._fetch_symbols(symbols)
+            
+            result = await asyncio.wait_for(
+                self.agent.run(
                     f"""
-                    Please compare these stocks: {', '.join(symbols)}
+                    Please analyze each of these stocks: {', '.join(symbols)}
+                    
+                    The current daily data and alerts for each stock have already been
+                    fetched from the MCP tools and are included below.
                     
-                    For each stock, please call these MCP tools:
-                    1. get-daily-stock-data with the stock symbol
-                    2. get-stock-data with 5min interval 
-                    3. get-stock-alerts for each symbol
+                    {stock_data}
                     
-                    Then provide a comparison including:
-                    - Performance comparison based on the data
-                    - Risk analysis for each stock
-                    - Portfolio allocation recommendations for {profile.risk_tolerance} tolerance
-                    - Best and worst performers with explanations
-                    - Investment strategy for {profile.investment_horizon} horizon
+                    For each stock provide a brief analysis including:
+                    - Current price and recent performance
+                    - Buy/hold/sell recommendation for {profile.risk_tolerance} risk tolerance
+                    - Key insights for {profile.investment_horizon} investment horizon
                     """,
                     deps=profile,
-                    model_settings={
-                        'max_tokens': 3000
-                    }
-                )
+                    model_settings={'max_tokens': 3000}
+                ),
+                timeout=timeout
+            )
+            
+            logfire.info(f"Buffered analysis completed for {len(symbols)} symbols")
+            return result.output
+        
+        except asyncio.TimeoutError:
+            logfire.error(f"Buffered analysis timed out for {', '.join(symbols)}")
+            return f"⏰ Analysis for {', '.join(symbols)} timed out. Please try again with fewer symbols."
+        except Exception as e:
+            logfire.error(f"Buffered analysis failed for {', '.join(symbols)}: {e}")
+            return f"❌ Analysis failed for {', '.join(symbols)}: {str(e)}"
+    
+    async def compare_stocks(self, symbols: List[str], profile: UserProfile) -> str:
+        """Compare multiple stocks and provide portfolio recommendations."""
+        logfire.info(f"Comparing stocks: {', '.join(symbols)} for user: {profile.name}")
+        
+        try:
+            await self._ensure_mcp_servers()
+            # Fetch every symbol up front in parallel, then make one LLM call
+            stock_data = await self._fetch_symbols(symbols, include_intraday=True)
+            
+            result = await self.agent.run(
+                f"""
+                Please compare these stocks: {', '.join(symbols)}
+                
+                The daily data, 5min intraday data and alerts for each stock have
+                already been fetched from the MCP tools and are included below, so
+                there is no need to call those tools again.
+                
+                {stock_data}
                 
-                logfire.info("Stock comparison completed")
-                return result.output
+                Then provide a comparison including:
+                - Performance comparison based on the data
+                - Risk analysis for each stock
+                - Portfolio allocation recommendations for {profile.risk_tolerance} tolerance
+                - Best and worst performers with explanations
+                - Investment strategy for {profile.investment_horizon} horizon
+                """,
+                deps=profile,
+                model_settings={
+                    'max_tokens': 3000
+                }
+            )
+            
+            logfire.info("Stock comparison completed")
+            return result.output
         except Exception as e:
             logfire.error(f"Stock comparison failed: {e}")
             return f"❌ Stock comparison failed: {str(e)}"
-        finally:
-            await cleanup_tasks()
     
     async def market_overview(self, sectors: List[str] = None) -> str:
         """Get market overview for specified sectors."""
@@ -529,57 +791,58 @@ class AIStockAnalyst:
         logfire.info(f"Generating market overview for: {', '.join(sectors)}")
         
         try:
-            async with self.agent.run_mcp_servers():
-                result = await self.agent.run(
-                    f"""
-                    Please provide a comprehensive market overview by analyzing these key stocks: {', '.join(sectors)}
-                    
-                    For each stock ({', '.join(sectors)}), please call:
-                    1. get-daily-stock-data to get current data
-                    2. get-stock-alerts to check for significant movements
-                    
-                    Then provide a market overview including:
-                    - Overall market sentiment analysis
-                    - Sector performance trends
-                    - Key opportunities and risks identified
-                    - Market outlook based on current performance
-                    - Top recommendations supported by the data
-                    """,
-                    deps=UserProfile(),
-                    model_settings={
-                        'max_tokens': 2500
-                    }
-                )
+            await self._ensure_mcp_servers()
+            # Fetch every symbol up front in parallel, then make one LLM call
+            stock_data = await self._fetch_symbols(sectors)
+            
+            result = await self.agent.run(
+                f"""
+                Please provide a comprehensive market overview by analyzing these key stocks: {', '.join(sectors)}
+                
+                The current daily data and alerts for each stock have already been
+                fetched from the MCP tools and are included below, so there is no
+                need to call those tools again.
+                
+                {stock_data}
                 
-                logfire.info("Market overview completed")
-                return result.output
+                Then provide a market overview including:
+                - Overall market sentiment analysis
+                - Sector performance trends
+                - Key opportunities and risks identified
+                - Market outlook based on current performance
+                - Top recommendations supported by the data
+                """,
+                deps=_DEFAULT_PROFILE,
+                model_settings={
+                    'max_tokens': 2500
+                }
+            )
+            
+            logfire.info("Market overview completed")
+            return result.output
         except Exception as e:
             logfire.error(f"Market overview failed: {e}")
             return f"❌ Market overview failed: {str(e)}"
-        finally:
-            await cleanup_tasks()
     
     async def quick_analysis(self, symbol: str, timeout: int = 30) -> str:
         """Quick stock analysis with just daily data."""
-        profile = UserProfile()
+        profile = _DEFAULT_PROFILE
         
         try:
-            async with self.agent.run_mcp_servers():
-                result = await asyncio.wait_for(
-                    self.agent.run(
-                        f"Please call get-daily-stock-data with symbol='{symbol}' and provide a brief analysis with current price and recommendation.",
-                        deps=profile,
-                        model_settings={'max_tokens': 800}
-                    ),
-                    timeout=timeout
-                )
-                return result.output
+            await self._ensure_mcp_servers()
+            result = await asyncio.wait_for(
+                self.agent.run(
+                    f"Please call get-daily-stock-data with symbol='{symbol}' and provide a brief analysis with current price and recommendation.",
+                    deps=profile,
+                    model_settings={'max_tokens': 800}
+                ),
+                timeout=timeout
+            )
+            return result.output
         except asyncio.TimeoutError:
             return f"⏰ Quick analysis for {symbol} timed out. Please try again."
         except Exception as e:
             return f"❌ Quick analysis failed for {symbol}: {str(e)}"
-        finally:
-            await cleanup_tasks()
     
     async def verify_tools_working(self) -> bool:
         """Simple verification that MCP tools are available."""
@@ -1,18 +1,91 @@
 """Interactive CLI interface for AI Stock Analyst."""
 
 import asyncio
+import re
+import threading
+from functools import cached_property
+from typing import Optional
+
 import logfire
 
 from .models import UserProfile
 from .agent import AIStockAnalyst
-from .config import cleanup_tasks
+
+# Tickers and company names recognized in questions, mapped to their symbol
+_SYMBOL_ALIASES = {
+    'aapl': 'AAPL', 'googl': 'GOOGL', 'msft': 'MSFT', 'tsla': 'TSLA',
+    'amzn': 'AMZN', 'meta': 'META', 'nvda': 'NVDA', 'nflx': 'NFLX',
+    'apple': 'AAPL', 'google': 'GOOGL', 'microsoft': 'MSFT', 'tesla': 'TSLA',
+    'amazon': 'AMZN', 'nvidia': 'NVDA', 'netflix': 'NFLX',
+}
+_SYMBOL_RE = re.compile(r'\b(?:' + '|'.join(map(re.escape, _SYMBOL_ALIASES)) + r')\b', re.IGNORECASE)
+
+# Fixed CLI text, built once instead of on every session turn
+_SESSION_BANNER = "\n".join((
+    "\n" + "=" * 60,
+    "🤖 AI Stock Analyst - Ask Any Question!",
+    "=" * 60,
+    "🎯 I'll automatically choose the best tool for your question:",
+    "📊 For detailed data → CSV export with full historical data",
+    "📝 For quick questions → Fast text summary",
+    "\n💡 Example questions you can ask:",
+    "   📈 'Get daily data for AAPL and save it to Excel'",
+    "   📊 'Show me Tesla's performance data for export'",
+    "   💬 'What's your opinion on Apple stock?'",
+    "   🤔 'Should I buy Microsoft?'",
+    "   📋 'Get me 5-minute intraday data for Google'",
+))
+_TURN_SEPARATOR = "\n" + "-" * 50
+_ANALYSIS_HEADER = "\n".join(("\n" + "=" * 60, "📊 ANALYSIS", "=" * 60))
+
+
+async def _ainput(prompt: str) -> str:
+    """
+    input() that doesn't block the event loop, so background tasks keep running
+    while the user types.
+    
+    Reads on a daemon thread rather than the default executor, so Ctrl+C can
+    shut the loop down without waiting for a pending input() to return.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def resolve(line: Optional[str], error: Optional[BaseException]) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(line)
+    
+    def read_line() -> None:
+        try:
+            line, error = input(prompt), None
+        except BaseException as e:
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, line, error)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+    
+    threading.Thread(target=read_line, daemon=True).start()
+    return await future
 
 
 class StockAnalystCLI:
     """Interactive command line interface for the AI Stock Analyst."""
     
-    def __init__(self):
-        self.analyst = AIStockAnalyst()
+    @cached_property
+    def analyst(self) -> AIStockAnalyst:
+        """Analyst built on first use, so quitting at the first prompt costs nothing."""
+        return AIStockAnalyst()
+    
+    async def aclose(self) -> None:
+        """Close the analyst's sessions, if it was ever created."""
+        analyst = self.__dict__.get('analyst')
+        if analyst is not None:
+            await analyst.aclose()
     
     async def interactive_session(self, profile: UserProfile):
         """Run an interactive analysis session."""
@@ -24,25 +97,13 @@ class StockAnalystCLI:
 
     async def smart_analysis_session(self, profile: UserProfile):
         """Interactive smart analysis that auto-detects request type."""
-        print("\n" + "="*60)
-        print("🤖 AI Stock Analyst - Ask Any Question!")
-        print("="*60)
-        print("🎯 I'll automatically choose the best tool for your question:")
-        print("📊 For detailed data → CSV export with full historical data")
-        print("📝 For quick questions → Fast text summary")
-        
-        print("\n💡 Example questions you can ask:")
-        print("   📈 'Get daily data for AAPL and save it to Excel'")
-        print("   📊 'Show me Tesla's performance data for export'")
-        print("   💬 'What's your opinion on Apple stock?'")
-        print("   🤔 'Should I buy Microsoft?'")
-        print("   📋 'Get me 5-minute intraday data for Google'")
+        print(_SESSION_BANNER)
         
         while True:
-            print("\n" + "-"*50)
+            print(_TURN_SEPARATOR)
             
             # Simplified input - just ask for the question directly
-            question = input("\n❓ Ask me anything about a stock (or 'quit' to exit):\n> ").strip()
+            question = (await _ainput("\n❓ Ask me anything about a stock (or 'quit' to exit):\n> ")).strip()
             
             if question.lower() in ['quit', 'exit', 'q']:
                 break
@@ -51,24 +112,12 @@ class StockAnalystCLI:
                 print("💡 Please ask a question about a stock!")
                 continue
             
-            # Try to extract symbol from the question
-            symbols = []
-            common_symbols = ['AAPL', 'GOOGL', 'MSFT', 'TSLA', 'AMZN', 'META', 'NVDA', 'NFLX']
-            companies = {'apple': 'AAPL', 'google': 'GOOGL', 'microsoft': 'MSFT', 'tesla': 'TSLA', 
-                        'amazon': 'AMZN', 'meta': 'META', 'nvidia': 'NVDA', 'netflix': 'NFLX'}
-            
-            question_upper = question.upper()
-            for symbol in common_symbols:
-                if symbol in question_upper:
-                    symbols.append(symbol)
-            
-            for company, symbol in companies.items():
-                if company.lower() in question.lower():
-                    symbols.append(symbol)
+            # Try to extract symbols from the question in one regex scan
+            symbols = [_SYMBOL_ALIASES[match.group(0).lower()] for match in _SYMBOL_RE.finditer(question)]
             
             # If no symbol found, ask for it
             if not symbols:
-                symbol = input("📈 Which stock symbol? (e.g., AAPL, TSLA, GOOGL): ").strip().upper()
+                symbol = (await _ainput("📈 Which stock symbol? (e.g., AAPL, TSLA, GOOGL): ")).strip().upper()
                 if not symbol:
                     continue
                 symbols = [symbol]
@@ -83,9 +132,7 @@ class StockAnalystCLI:
                 # Use smart analysis
                 response, csv_file = await self.analyst.smart_analyze(question, symbol, profile)
                 
-                print(f"\n{'='*60}")
-                print("📊 ANALYSIS")
-                print(f"{'='*60}")
+                print(_ANALYSIS_HEADER)
                 print(response)
                 
                 if csv_file:
@@ -93,7 +140,7 @@ class StockAnalystCLI:
                     print("💡 Open this file in Excel or Google Sheets!")
                 
                 # Ask if they want to continue
-                continue_choice = input(f"\n🔄 Ask another question? (y/n): ").strip().lower()
+                continue_choice = (await _ainput("\n🔄 Ask another question? (y/n): ")).strip().lower()
                 if continue_choice not in ['y', 'yes']:
                     break
                     
@@ -112,12 +159,15 @@ class StockAnalystCLI:
             print("\n🤖 Demo: AI Stock Analyst")
             print("-" * 40)
             
+            # Both demo requests are independent, so run them concurrently
+            (specific_response, csv_file), (general_response, _) = await asyncio.gather(
+                self.analyst.smart_analyze("Get AAPL daily data and save to Excel", "AAPL", profile),
+                self.analyst.smart_analyze("What's your opinion on Apple stock?", "AAPL", profile)
+            )
+            
             # Demo specific request (CSV export)
             print("\n📊 Demo 1: 'Get AAPL daily data and save to Excel'")
-            response, csv_file = await self.analyst.smart_analyze(
-                "Get AAPL daily data and save to Excel", "AAPL", profile
-            )
-            print(response[:200] + "...")
+            print(specific_response[:200] + "...")
             if csv_file:
                 print(f"📁 CSV file created: {csv_file}")
             
@@ -125,10 +175,7 @@ class StockAnalystCLI:
             
             # Demo general request (quick summary)
             print("\n💬 Demo 2: 'What's your opinion on Apple stock?'")
-            response, csv_file = await self.analyst.smart_analyze(
-                "What's your opinion on Apple stock?", "AAPL", profile
-            )
-            print(response[:200] + "...")
+            print(general_response[:200] + "...")
             
             print("\n✅ Demo Complete!")
             print("💡 Try interactive mode to ask your own questions!")
@@ -137,8 +184,6 @@ class StockAnalystCLI:
             logfire.error(f"Demo failed: {e}")
             print(f"❌ Demo Error: {e}")
             print("💡 Try interactive mode instead")
-        finally:
-            await cleanup_tasks()
 
     def get_user_profile(self) -> UserProfile:
         """Get a simple default user profile."""
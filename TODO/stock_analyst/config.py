@@ -8,15 +8,6 @@ from typing import Optional
 
 import logfire
 
-# Windows-specific asyncio subprocess cleanup
-if sys.platform == "win32":
-    warnings.filterwarnings("ignore", category=ResourceWarning, message=".*Event loop is closed.*")
-    warnings.filterwarnings("ignore", category=ResourceWarning, message=".*I/O operation on closed pipe.*")
-    
-    # Set the appropriate event loop policy for Windows
-    if hasattr(asyncio, 'WindowsProactorEventLoopPolicy'):
-        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-
 def setup_environment() -> None:
     """Set up environment variables and configuration."""
     # Set Claude API key
@@ -38,8 +29,12 @@ def get_alpha_vantage_api_key() -> str:
     """Get the Alpha Vantage API key."""
     return 'L7SS5AKKMK8UDTFA'  # Replace with your new key
 
-async def cleanup_tasks() -> None:
-    """Clean up asyncio tasks and handle Windows subprocess cleanup."""
+async def cleanup_tasks(timeout: float = 1.0) -> None:
+    """Clean up asyncio tasks and handle Windows subprocess cleanup.
+    
+    Cancels every other task on the loop, so only call it on shutdown
+    (e.g. from AIStockAnalyst.aclose), never after individual requests.
+    """
     try:
         # Get the current event loop
         loop = asyncio.get_running_loop()
@@ -56,32 +51,69 @@ async def cleanup_tasks() -> None:
                 if not task.cancelled() and not task.done():
                     task.cancel()
             
-            # Wait a short time for cancellation to propagate
-            await asyncio.sleep(0.05)
-            
-            # Gather results, suppressing cancellation exceptions
-            try:
-                await asyncio.wait_for(
-                    asyncio.gather(*tasks, return_exceptions=True),
-                    timeout=1.0
-                )
-            except asyncio.TimeoutError:
-                # Some tasks didn't cancel in time, that's OK
-                pass
+            # Return as soon as every task has finished cancelling; tasks
+            # still running after the timeout are left to the loop shutdown
+            await asyncio.wait(tasks, timeout=timeout)
         
         # On Windows, ensure subprocess cleanup
         if sys.platform == "win32":
-            # Give subprocess transports time to clean up
-            await asyncio.sleep(0.1)
+            # Let already-scheduled transport close callbacks run, and only
+            # wait longer if some tasks are still winding down
+            await asyncio.sleep(0)
+            if any(not task.done() for task in tasks):
+                await asyncio.sleep(0.1)
             
     except Exception:
         # Silently handle cleanup errors to avoid noise
         pass
 
+def _shutdown_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Cancel leftover tasks, shut down generators and the executor, then close the loop."""
+    try:
+        # Proper cleanup sequence
+        if not loop.is_closed():
+            # Cancel any remaining tasks more safely
+            pending_tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
+            for task in pending_tasks:
+                if not task.cancelled():
+                    task.cancel()
+            
+            # Wait briefly for cancellations to complete
+            if pending_tasks:
+                try:
+                    loop.run_until_complete(asyncio.wait(pending_tasks, timeout=0.5))
+                except (asyncio.TimeoutError, RuntimeError):
+                    # Some tasks didn't cancel in time or loop issues, continue cleanup
+                    pass
+            
+            # Shutdown async generators
+            try:
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            except RuntimeError:
+                # Loop might already be closing
+                pass
+            
+            # Shutdown default executor
+            if hasattr(loop, 'shutdown_default_executor'):
+                try:
+                    loop.run_until_complete(loop.shutdown_default_executor())
+                except RuntimeError:
+                    # Loop might already be closing
+                    pass
+            
+            # Close the loop
+            loop.close()
+    except Exception:
+        # Ignore cleanup errors on exit
+        pass
+
 def run_with_proper_cleanup(main_func):
     """Run the main function with proper Windows asyncio cleanup."""
     if sys.platform == "win32":
-        # Use ProactorEventLoop on Windows for better subprocess support
+        # Use ProactorEventLoop on Windows for better subprocess support; set the
+        # policy here rather than at import so importing config has no side effects
+        if hasattr(asyncio, 'WindowsProactorEventLoopPolicy'):
+            asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
         loop = asyncio.ProactorEventLoop()
         asyncio.set_event_loop(loop)
     else:
@@ -91,45 +123,10 @@ def run_with_proper_cleanup(main_func):
     try:
         loop.run_until_complete(main_func())
     finally:
-        try:
-            # Proper cleanup sequence
-            if not loop.is_closed():
-                # Cancel any remaining tasks more safely
-                pending_tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
-                for task in pending_tasks:
-                    if not task.cancelled():
-                        task.cancel()
-                
-                # Wait briefly for cancellations to complete
-                if pending_tasks:
-                    try:
-                        loop.run_until_complete(
-                            asyncio.wait_for(
-                                asyncio.gather(*pending_tasks, return_exceptions=True),
-                                timeout=0.5
-                            )
-                        )
-                    except (asyncio.TimeoutError, RuntimeError):
-                        # Some tasks didn't cancel in time or loop issues, continue cleanup
-                        pass
-                
-                # Shutdown async generators
-                try:
-                    loop.run_until_complete(loop.shutdown_asyncgens())
-                except RuntimeError:
-                    # Loop might already be closing
-                    pass
-                
-                # Shutdown default executor
-                if hasattr(loop, 'shutdown_default_executor'):
-                    try:
-                        loop.run_until_complete(loop.shutdown_default_executor())
-                    except RuntimeError:
-                        # Loop might already be closing
-                        pass
-                
-                # Close the loop
-                loop.close()
-        except Exception:
-            # Ignore cleanup errors on exit
-            pass 
\ No newline at end of file
+        # Only silence the Windows subprocess teardown noise while the loop shuts down,
+        # instead of registering process-wide warning filters at import
+        with warnings.catch_warnings():
+            if sys.platform == "win32":
+                warnings.filterwarnings("ignore", category=ResourceWarning, message=".*Event loop is closed.*")
+                warnings.filterwarnings("ignore", category=ResourceWarning, message=".*I/O operation on closed pipe.*")
+            _shutdown_loop(loop)
\ No newline at end of file
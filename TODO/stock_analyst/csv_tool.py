@@ -1,14 +1,19 @@
 """Alpha Vantage CSV tools for PydanticAI agent."""
 
-import aiohttp
 import asyncio
-import pandas as pd
-from typing import Optional, Literal
+import csv
+import io
+from typing import TYPE_CHECKING, List, Optional, Literal
+from cachetools import TTLCache
 from pydantic import BaseModel, Field
 import logfire
 
 from .config import get_alpha_vantage_api_key
 
+if TYPE_CHECKING:
+    # aiohttp is imported on the first request, not when the CLI starts
+    import aiohttp
+
 
 class AlphaVantageCSVParams(BaseModel):
     """Parameters for Alpha Vantage CSV requests."""
@@ -34,11 +39,64 @@ class AlphaVantageCSVParams(BaseModel):
     )
 
 
-async def fetch_alpha_vantage_csv(params: AlphaVantageCSVParams) -> str:
+# Shared HTTP session so repeated requests reuse pooled keep-alive connections
+_session: Optional["aiohttp.ClientSession"] = None
+
+# Total timeout for one Alpha Vantage request, set once on the shared session
+_REQUEST_TIMEOUT_SECONDS = 30
+
+# Chunk size used when streaming CSV response bodies
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of a response checked for Alpha Vantage error/rate-limit messages
+_SENTINEL_SCAN_BYTES = 512
+
+# Max concurrent requests issued by fetch_many, to stay within Alpha Vantage rate limits
+_FETCH_MANY_CONCURRENCY = 5
+
+# Successful responses are cached; live intraday data goes stale much faster than
+# daily/weekly data or a past month of intraday data
+_daily_csv_cache: TTLCache = TTLCache(maxsize=512, ttl=3600)
+_intraday_csv_cache: TTLCache = TTLCache(maxsize=512, ttl=60)
+
+# In-flight fetches by cache key, so concurrent callers share one request
+_inflight_fetches: dict = {}
+
+# Prefixes of the error strings returned by fetch_alpha_vantage_csv, which must not be cached
+_ERROR_PREFIXES = ("API Error", "Rate limit", "Request failed", "Request timed out", "Error")
+
+
+def get_session() -> "aiohttp.ClientSession":
+    """Return the shared Alpha Vantage HTTP session, creating it on first use."""
+    global _session
+    if _session is None or _session.closed:
+        import aiohttp
+        
+        connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300, keepalive_timeout=60)
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=_REQUEST_TIMEOUT_SECONDS)
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared HTTP session, if one was opened."""
+    global _session
+    session, _session = _session, None
+    if session is not None and not session.closed:
+        await session.close()
+
+
+async def fetch_alpha_vantage_csv(
+    params: AlphaVantageCSVParams, 
+    session: Optional["aiohttp.ClientSession"] = None
+) -> str:
     """
     Fetch stock data from Alpha Vantage as CSV format.
     
-    Returns CSV string that can be saved directly or processed with pandas.
+    Uses the shared session from get_session() unless one is passed in.
+    Returns CSV string that can be saved directly or processed with csv/pandas.
     """
     api_key = get_alpha_vantage_api_key()
     
@@ -66,28 +124,38 @@ async def fetch_alpha_vantage_csv(params: AlphaVantageCSVParams) -> str:
     logfire.info(f"Fetching Alpha Vantage CSV data: {params.function} for {params.symbol}")
     
     try:
-        timeout = aiohttp.ClientTimeout(total=30)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(base_url, params=url_params) as response:
-                if response.status == 200:
-                    csv_data = await response.text()
-                    
-                    # Check if we got an error message instead of CSV
-                    if "Error Message" in csv_data or "Note:" in csv_data:
-                        logfire.error(f"Alpha Vantage API error: {csv_data}")
-                        return f"API Error: {csv_data}"
-                    
-                    # Check if we hit rate limit
-                    if "Thank you for using Alpha Vantage" in csv_data:
-                        logfire.warning("Alpha Vantage rate limit reached")
-                        return "Rate limit reached. Please try again later."
-                    
-                    logfire.info(f"Successfully fetched CSV data: {len(csv_data)} characters")
-                    return csv_data
-                else:
-                    error_msg = f"HTTP {response.status}: {await response.text()}"
-                    logfire.error(f"Alpha Vantage request failed: {error_msg}")
-                    return f"Request failed: {error_msg}"
+        if session is None:
+            session = get_session()
+        async with session.get(base_url, params=url_params) as response:
+            if response.status == 200:
+                # Collect the body chunk by chunk and decode it once at the end
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(_READ_CHUNK_SIZE):
+                    body.extend(chunk)
+                encoding = response.charset or 'utf-8'
+                
+                # Error and rate-limit replies are short JSON bodies, while real data
+                # starts with a CSV header, so only the first bytes need checking
+                head = body[:_SENTINEL_SCAN_BYTES]
+                
+                # Check if we got an error message instead of CSV
+                if b"Error Message" in head or b"Note:" in head:
+                    csv_data = body.decode(encoding)
+                    logfire.error(f"Alpha Vantage API error: {csv_data}")
+                    return f"API Error: {csv_data}"
+                
+                # Check if we hit rate limit
+                if b"Thank you for using Alpha Vantage" in head:
+                    logfire.warning("Alpha Vantage rate limit reached")
+                    return "Rate limit reached. Please try again later."
+                
+                csv_data = body.decode(encoding)
+                logfire.info(f"Successfully fetched CSV data: {len(csv_data)} characters")
+                return csv_data
+            else:
+                error_msg = f"HTTP {response.status}: {await response.text()}"
+                logfire.error(f"Alpha Vantage request failed: {error_msg}")
+                return f"Request failed: {error_msg}"
     
     except asyncio.TimeoutError:
         logfire.error("Alpha Vantage request timed out")
@@ -97,6 +165,48 @@ async def fetch_alpha_vantage_csv(params: AlphaVantageCSVParams) -> str:
         return f"Error: {str(e)}"
 
 
+def _cache_for(params: AlphaVantageCSVParams) -> TTLCache:
+    """Pick the response cache for params; only live intraday data uses the short TTL."""
+    if params.function == "TIME_SERIES_INTRADAY" and params.month is None:
+        return _intraday_csv_cache
+    return _daily_csv_cache
+
+
+async def _cached_fetch(params: AlphaVantageCSVParams) -> str:
+    """Return a cached CSV response for params, fetching and caching it on a miss."""
+    key = (params.symbol.upper(), params.function, params.interval, params.outputsize, params.month)
+    cache = _cache_for(params)
+    csv_data = cache.get(key)
+    if csv_data is not None:
+        logfire.info(f"Alpha Vantage CSV cache hit: {key}")
+        return csv_data
+    
+    task = _inflight_fetches.get(key)
+    if task is None:
+        task = asyncio.create_task(fetch_alpha_vantage_csv(params))
+        _inflight_fetches[key] = task
+        task.add_done_callback(lambda _: _inflight_fetches.pop(key, None))
+    else:
+        logfire.info(f"Alpha Vantage CSV fetch already in flight: {key}")
+    
+    # Shield so one cancelled caller doesn't abort the fetch for the others
+    csv_data = await asyncio.shield(task)
+    if not csv_data.startswith(_ERROR_PREFIXES):
+        cache[key] = csv_data
+    return csv_data
+
+
+async def fetch_many(params_list: List[AlphaVantageCSVParams]) -> List[str]:
+    """Fetch several Alpha Vantage CSV requests concurrently, reusing cached responses."""
+    semaphore = asyncio.Semaphore(_FETCH_MANY_CONCURRENCY)
+    
+    async def fetch_one(params: AlphaVantageCSVParams) -> str:
+        async with semaphore:
+            return await _cached_fetch(params)
+    
+    return await asyncio.gather(*(fetch_one(params) for params in params_list))
+
+
 async def get_daily_stock_csv(symbol: str, adjusted: bool = True) -> str:
     """Get daily stock data as CSV."""
     function = "TIME_SERIES_DAILY_ADJUSTED" if adjusted else "TIME_SERIES_DAILY"
@@ -105,7 +215,7 @@ async def get_daily_stock_csv(symbol: str, adjusted: bool = True) -> str:
         function=function,
         outputsize="full"  # Get full historical data
     )
-    return await fetch_alpha_vantage_csv(params)
+    return await _cached_fetch(params)
 
 
 async def get_intraday_stock_csv(
@@ -121,7 +231,7 @@ async def get_intraday_stock_csv(
         outputsize="full",
         month=month
     )
-    return await fetch_alpha_vantage_csv(params)
+    return await _cached_fetch(params)
 
 
 async def get_weekly_stock_csv(symbol: str, adjusted: bool = True) -> str:
@@ -132,39 +242,60 @@ async def get_weekly_stock_csv(symbol: str, adjusted: bool = True) -> str:
         function=function,
         outputsize="full"
     )
-    return await fetch_alpha_vantage_csv(params)
+    return await _cached_fetch(params)
+
+
+def _csv_number(value: Optional[str]):
+    """Convert a CSV field to int/float like pandas would, leaving other text as is."""
+    if value is None:
+        return 'N/A'
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
 
 
 async def analyze_csv_data(csv_data: str, symbol: str) -> str:
     """
     Analyze CSV data and return insights.
-    This converts CSV to pandas for quick analysis.
+    Streams the rows once, keeping only the header, first and last row.
     """
     try:
-        from io import StringIO
-        
-        # Read CSV into pandas
-        df = pd.read_csv(StringIO(csv_data))
+        rows = csv.reader(io.StringIO(csv_data))
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("No columns to parse from file")
         
-        if df.empty:
+        first_row = next(rows, None)
+        if first_row is None:
             return f"No data available for {symbol}"
         
-        # Get basic info
-        latest_row = df.iloc[0] if not df.empty else None
-        if latest_row is None:
-            return f"No valid data found for {symbol}"
+        last_row = first_row
+        total_rows = 1
+        for row in rows:
+            if row:  # Skip blank lines, as pandas does
+                last_row = row
+                total_rows += 1
+        
+        # Latest data comes first in Alpha Vantage CSV output
+        latest_row = dict(zip(header, first_row))
+        oldest_row = dict(zip(header, last_row))
+        price = _csv_number(latest_row.get('close', latest_row.get('4. close')))
+        volume = _csv_number(latest_row.get('volume', latest_row.get('5. volume')))
         
         # Extract key metrics
         analysis = f"""
 📊 **CSV Data Analysis for {symbol}**
 
 📈 **Latest Data Point**: {latest_row.get('timestamp', 'N/A')}
-💰 **Current Price**: ${latest_row.get('close', latest_row.get('4. close', 'N/A'))}
-📊 **Trading Volume**: {latest_row.get('volume', latest_row.get('5. volume', 'N/A')):,}
+💰 **Current Price**: ${price}
+📊 **Trading Volume**: {volume:,}
 
 📋 **Dataset Info**:
-- Total data points: {len(df)}
-- Date range: {df.iloc[-1].get('timestamp', 'N/A')} to {df.iloc[0].get('timestamp', 'N/A')}
+- Total data points: {total_rows}
+- Date range: {oldest_row.get('timestamp', 'N/A')} to {latest_row.get('timestamp', 'N/A')}
 
 💾 **CSV Data Retrieved**: {len(csv_data)} characters of raw CSV data
 """
@@ -28,6 +28,9 @@ async def main():
         print("\n\n👋 Thank you for using AI Stock Analyst!")
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
+    finally:
+        # Close the MCP session shared across every analysis in this run
+        await cli.aclose()
 
 
 def run():
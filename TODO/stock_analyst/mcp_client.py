@@ -1,17 +1,24 @@
 """MCP server setup and management for AI Stock Analyst."""
 
+import functools
 import os
 from pydantic_ai.mcp import MCPServerStdio
 from .config import get_mcp_server_path, get_alpha_vantage_api_key
 
 
+@functools.lru_cache(maxsize=1)
+def _mcp_env() -> dict:
+    """Environment for the MCP server process, built once from the first call's os.environ."""
+    return {
+        'ALPHA_VANTAGE_API_KEY': get_alpha_vantage_api_key(),
+        **os.environ
+    }
+
+
 def create_mcp_server() -> MCPServerStdio:
     """Create and configure the MCP server for stock analysis."""
     return MCPServerStdio(
         'node',
         args=[get_mcp_server_path()],
-        env={
-            'ALPHA_VANTAGE_API_KEY': get_alpha_vantage_api_key(),
-            **os.environ
-        }
-    ) 
\ No newline at end of file
+        env=_mcp_env()
+    )
\ No newline at end of file
@@ -6,6 +6,7 @@ from datetime import datetime
 import csv
 import io
 
+import numpy as np
 from pydantic import BaseModel, Field
 
 
@@ -31,6 +32,32 @@ class StockDataPoint(BaseModel):
     volume: int = Field(description="Trading volume")
     daily_change: Optional[float] = Field(description="Daily price change", default=None)
     daily_change_pct: Optional[float] = Field(description="Daily percentage change", default=None)
+    
+    @classmethod
+    def from_csv_row(cls, row: dict, symbol: str) -> "StockDataPoint":
+        """
+        Build a data point from an Alpha Vantage CSV row (csv.DictReader dict).
+        
+        Values are converted here and field validation is skipped, so only use
+        this for rows from a CSV whose header has already been checked.
+        """
+        return cls.model_construct(
+            date=row['timestamp'],
+            symbol=symbol,
+            open_price=float(row['open']),
+            high_price=float(row['high']),
+            low_price=float(row['low']),
+            close_price=float(row['close']),
+            volume=int(row['volume']),
+            daily_change=None,
+            daily_change_pct=None
+        )
+
+
+_CSV_FIELDNAMES = ('date', 'symbol', 'open_price', 'high_price', 'low_price',
+                   'close_price', 'volume', 'daily_change', 'daily_change_pct')
+# Header line exactly as csv.writer would emit it (default \r\n line terminator)
+_CSV_HEADER = ",".join(_CSV_FIELDNAMES) + "\r\n"
 
 
 class DetailedStockData(BaseModel):
@@ -40,23 +67,52 @@ class DetailedStockData(BaseModel):
     analysis_date: str = Field(description="When this analysis was performed")
     summary_stats: Optional[dict] = Field(description="Summary statistics", default=None)
     
-    def to_csv(self) -> str:
-        """Convert stock data to CSV format."""
-        output = io.StringIO()
-        if not self.data_points:
-            return "No data available"
+    def to_soa(self) -> dict:
+        """
+        Column arrays for vectorized analytics (struct-of-arrays).
         
-        fieldnames = ['date', 'symbol', 'open_price', 'high_price', 'low_price', 
-                     'close_price', 'volume', 'daily_change', 'daily_change_pct']
+        Prices are float64 and volume is int64; e.g. daily returns are
+        np.diff(soa['close_price']) / soa['close_price'][:-1].
+        """
+        points = self.data_points
+        count = len(points)
         
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
+        def column(field: str, dtype) -> np.ndarray:
+            return np.fromiter((getattr(point, field) for point in points), dtype=dtype, count=count)
         
-        for point in self.data_points:
-            writer.writerow(point.model_dump())
+        return {
+            'date': [point.date for point in points],
+            'open_price': column('open_price', np.float64),
+            'high_price': column('high_price', np.float64),
+            'low_price': column('low_price', np.float64),
+            'close_price': column('close_price', np.float64),
+            'volume': column('volume', np.int64),
+        }
+    
+    def to_csv_bytes(self) -> bytes:
+        """Convert stock data to UTF-8 encoded CSV, ready to write to a file."""
+        if not self.data_points:
+            return b"No data available"
+        
+        # Rows are encoded as they are written, so no full-size str copy is built
+        output = io.BytesIO()
+        text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+        text.write(_CSV_HEADER)
         
+        # Write plain row tuples instead of a model_dump() dict per point
+        csv.writer(text).writerows(
+            (point.date, point.symbol, point.open_price, point.high_price, point.low_price,
+             point.close_price, point.volume, point.daily_change, point.daily_change_pct)
+            for point in self.data_points
+        )
+        
+        text.flush()
+        text.detach()
         return output.getvalue()
-
+    
+    def to_csv(self) -> str:
+        """Convert stock data to CSV format."""
+        return self.to_csv_bytes().decode('utf-8')
 
 class RequestType(BaseModel):
     """Classification of user request type."""
@@ -4,7 +4,7 @@ This demonstrates how to fetch financial news articles and analyze them using GP
 """
 
 from tavily_search_news import search_tavily_news
-from llm_service import LLMService
+from llm_service import LLMService, truncate_to_tokens
 from typing import Dict, Any
 from dotenv import load_dotenv
 
@@ -44,17 +44,19 @@ def fetch_and_analyze_news(company_symbol: str, query: str = None, max_results:
     search_results = search_tavily_news(
         query=query,
         max_results=max_results,
-        include_domains=domains
+        include_domains=domains,
+        include_raw_content=True
     )
     
     if not search_results["success"]:
         raise Exception(f"Failed to fetch news: {search_results.get('error', 'Unknown error')}")
     
-    # Prepare articles for analysis
+    # Prepare articles for analysis, truncating content to the prompt budget once here
     articles = [
         {
             "title": article["title"],
             "content": article["metadata"]["raw_content"],
+            "snippet": truncate_to_tokens(article["metadata"]["raw_content"]),
             "url": article["url"],
             "published_at": article["published_at"]
         }
@@ -1,17 +1,62 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from openai import OpenAI
-from pydantic import BaseModel, Field
-from typing import List
+import re
+import tempfile
+import time
+import httpx
+from functools import lru_cache
+from openai import AsyncOpenAI, OpenAIError
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, with_config
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+from typing_extensions import Annotated, TypedDict
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
+def get_client() -> AsyncOpenAI:
+    """OpenAI client with a pooled HTTP client, created on first use so importing this module stays cheap."""
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=100, max_keepalive_connections=100))
+    )
+
+# Kept byte-identical across calls so OpenAI's automatic prompt caching can reuse the prefix;
+# the analysis prompt extends the extraction prompt rather than rewording it for the same reason.
+SYSTEM_PROMPT = """Analyze the attached financial documents and extract structured data.
+                Follow these extraction rules:
+                1. Identify account holder information in document headers
+                2. Locate transaction tables with trade execution details
+                3. Convert all currency values to base currency
+                4. Map data fields to JSON schema precisely"""
+
+ANALYSIS_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+                Then, acting as an objective financial analyst, assess the extracted activity:
+                overall performance, the positions that drove it, risk factors and investment considerations."""
+
+# Extracted statements are cached on disk as {blake2b of the PDF bytes}.json
+STATEMENT_CACHE_DIR = os.getenv("STATEMENT_CACHE_DIR", "cache")
+
+# Uploaded PDFs are reused by content hash for this long, then deleted and uploaded again
+UPLOADED_FILE_TTL_SECONDS = 24 * 60 * 60
+
+# Extracted statements are shared through the in-process cache, so the models are frozen.
+# Strict mode: the model's output already follows the JSON schema, so no lax coercions are tried.
+STATEMENT_MODEL_CONFIG = ConfigDict(frozen=True, extra='ignore', strict=True)
 
 class AccountInformation(BaseModel):
     """Account information extracted from financial statements."""
+    model_config = STATEMENT_MODEL_CONFIG
+
     name: str = Field(..., description="Account holder's full name, it is 'Name' in InteractiveBrokers's statements")
     account: str = Field(..., description="Account number, potentially masked, it is 'Account' in InteractiveBrokers's statements")
     account_type: str = Field(..., description="Type of account (e.g., Individual, Joint), it is 'Account Type' in InteractiveBrokers's statements")
@@ -20,83 +65,475 @@ class AccountInformation(BaseModel):
     trading_permissions: List[str] = Field(..., description="List of permitted trading instruments, it is 'Trading Permissions' in InteractiveBrokers's statements")
     base_currency: str = Field(..., description="Base currency for the account, it is 'Base Currency' in InteractiveBrokers's statements")
 
-class Transaction(BaseModel):
+# A TypedDict rather than a BaseModel: rows are only reached through FinancialStatement,
+# so they are validated as plain dicts without building a model instance per row.
+# The docstring and field descriptions still end up in the JSON schema sent to OpenAI.
+@with_config(ConfigDict(strict=True))
+class Transaction(TypedDict):
     """Individual transaction record from financial statements."""
-    symbol: str = Field(..., description="Trading symbol or ticker")
-    date_time: str = Field(..., description="Transaction date and time, it is 'Date/Time' in InteractiveBrokers's statements")
-    quantity: float = Field(..., description="Number of shares or units traded, it can be a float number.")
-    trade_price: float = Field(..., description="Price per unit at execution, it is 'T.Price' in InteractiveBrokers's statements")
-    close_price: float = Field(..., description="Closing price on trade date, it is 'C.Price' in InteractiveBrokers's statements")
-    proceeds: float = Field(..., description="Total proceeds from transaction")
-    commission_fee: float = Field(..., description="Commission or fee charged, it is 'Comm/Fee' in InteractiveBrokers's statements")
-    basis: float = Field(..., description="Cost basis for the position")
-    realized_p_l: float = Field(..., description="Realized profit or loss, it is 'Realized P/L' in InteractiveBrokers's statements")
-    mtm_p_l: float = Field(..., description="Mark-to-market profit or loss, it is 'MTM P/L' in InteractiveBrokers's statements")
-    code: str = Field(..., description="Transaction or position code")
+    symbol: Annotated[str, Field(description="Trading symbol or ticker")]
+    date_time: Annotated[str, Field(description="Transaction date and time, it is 'Date/Time' in InteractiveBrokers's statements")]
+    quantity: Annotated[float, Field(description="Number of shares or units traded, it can be a float number.")]
+    trade_price: Annotated[float, Field(description="Price per unit at execution, it is 'T.Price' in InteractiveBrokers's statements")]
+    close_price: Annotated[float, Field(description="Closing price on trade date, it is 'C.Price' in InteractiveBrokers's statements")]
+    proceeds: Annotated[float, Field(description="Total proceeds from transaction")]
+    commission_fee: Annotated[float, Field(description="Commission or fee charged, it is 'Comm/Fee' in InteractiveBrokers's statements")]
+    basis: Annotated[float, Field(description="Cost basis for the position")]
+    realized_p_l: Annotated[float, Field(description="Realized profit or loss, it is 'Realized P/L' in InteractiveBrokers's statements")]
+    mtm_p_l: Annotated[float, Field(description="Mark-to-market profit or loss, it is 'MTM P/L' in InteractiveBrokers's statements")]
+    code: Annotated[str, Field(description="Transaction or position code")]
 
 class FinancialStatement(BaseModel):
     """Complete financial statement data structure."""
+    model_config = STATEMENT_MODEL_CONFIG
+
     account_information: AccountInformation = Field(..., description="Account details and permissions")
     transactions: List[Transaction] = Field(..., description="List of all transactions in the statement")
 
-# Generate JSON Schema for OpenAI API
-response_format_schema = FinancialStatement.model_json_schema()
+class BatchResult(BaseModel):
+    """Statements extracted from several documents in a single request."""
+    statements: List[FinancialStatement] = Field(..., description="One financial statement per attached file, in the same order as the files")
+
+class StatementAnalysis(BaseModel):
+    """A statement's extracted data together with an analysis of its trading activity."""
+    statement: FinancialStatement = Field(..., description="Account information and transactions extracted from the statement")
+    summary: str = Field(..., description="Overview of the trading activity and performance over the statement period")
+    key_positions: List[str] = Field(..., description="Symbols that drove most of the realized and mark-to-market P/L")
+    risk_factors: List[str] = Field(..., description="Risks visible in the activity, e.g. concentration, leverage or high fees")
+    investment_considerations: List[str] = Field(..., description="Points the account holder should consider going forward")
+
+# Validates single rows while a statement is still being streamed
+transaction_adapter = TypeAdapter(Transaction)
+
+@lru_cache(maxsize=1)
+def response_format_schema() -> dict:
+    """JSON Schema for the OpenAI response format, generated on first use and then reused."""
+    return BatchResult.model_json_schema()
+
+
+@lru_cache(maxsize=1)
+def analysis_format_schema() -> dict:
+    """JSON Schema for the fused extract-and-analyze response format."""
+    return StatementAnalysis.model_json_schema()
+
+
+def _read_file_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file_atomic(path: str, data: bytes) -> None:
+    """Write data to path through a temporary file, so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+async def read_pdf(pdf_path: str) -> bytes:
+    """Read a PDF on a worker thread so the event loop keeps serving other uploads."""
+    return await asyncio.to_thread(_read_file_bytes, pdf_path)
+
+
+def pdf_digest(pdf_bytes: bytes) -> str:
+    """Content hash of a PDF, used as its extraction and upload cache key."""
+    return hashlib.blake2b(pdf_bytes).hexdigest()
+
+
+# {pdf digest: {"file_id": ..., "uploaded_at": ...}}, loaded from disk on first use
+_uploaded_files: Optional[Dict[str, dict]] = None
+# Serializes loading and saving the map, so concurrent uploads don't interleave writes
+_uploaded_files_lock = asyncio.Lock()
+
+
+def _uploaded_files_path() -> str:
+    return os.path.join(STATEMENT_CACHE_DIR, "uploaded_files.json")
+
+
+async def load_uploaded_files() -> Dict[str, dict]:
+    """Map of PDF content hashes to the OpenAI files they were uploaded as."""
+    global _uploaded_files
+    if _uploaded_files is None:
+        async with _uploaded_files_lock:
+            if _uploaded_files is None:
+                try:
+                    _uploaded_files = json.loads(await asyncio.to_thread(_read_file_bytes, _uploaded_files_path()))
+                except FileNotFoundError:
+                    _uploaded_files = {}
+    return _uploaded_files
+
+
+async def save_uploaded_files() -> None:
+    """Persist the uploaded file map so later runs can reuse the uploads."""
+    uploaded_files = await load_uploaded_files()
+    async with _uploaded_files_lock:
+        # Snapshot under the lock, so the last write always holds the newest entries
+        data = json.dumps(uploaded_files).encode("utf-8")
+        await asyncio.to_thread(_write_file_atomic, _uploaded_files_path(), data)
+
+
+async def upload_pdf(pdf_path: str, pdf_bytes: Optional[bytes] = None) -> str:
+    """
+    Upload one PDF to OpenAI and return its file_id.
+
+    Reads the PDF first unless its bytes are passed in. An identical PDF uploaded
+    within UPLOADED_FILE_TTL_SECONDS is not sent again; its existing file_id is
+    reused. Expired uploads are deleted before uploading afresh.
+    """
+    if pdf_bytes is None:
+        pdf_bytes = await read_pdf(pdf_path)
+
+    digest = pdf_digest(pdf_bytes)
+    uploaded_files = await load_uploaded_files()
+    entry = uploaded_files.get(digest)
+    if entry is not None:
+        if time.time() - entry["uploaded_at"] < UPLOADED_FILE_TTL_SECONDS:
+            return entry["file_id"]
+        try:
+            await get_client().files.delete(entry["file_id"])
+        except OpenAIError as e:
+            logger.warning("Could not delete expired upload %s: %s", entry["file_id"], e)
+
+    uploaded_file = await get_client().files.create(
+        file=(os.path.basename(pdf_path), pdf_bytes),
+        purpose="assistants"
+    )
+    uploaded_files[digest] = {"file_id": uploaded_file.id, "uploaded_at": time.time()}
+    await save_uploaded_files()
+    return uploaded_file.id
+
+
+def build_completion_request(file_ids: List[str]) -> dict:
+    """Chat completion parameters that extract one statement per uploaded file."""
+    user_content = [
+        {
+            "type": "text",
+            "text": (
+                "Extract all account information and transactions from each attached statement in JSON format. "
+                f"Return exactly one entry in 'statements' per file, in this file_id order: {', '.join(file_ids)}."
+            )
+        }
+    ]
+    user_content.extend({"type": "file", "file": {"file_id": file_id}} for file_id in file_ids)
+
+    return {
+        "model": "gpt-4.1",
+        "messages": [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": user_content
+            }
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": 'statement_batch_schema',
+                "description": 'Monthly statmements of InteractiveBrokers, one per attached file',
+                "schema": response_format_schema()
+            }
+        }
+    }
+
+
+def transactions_frame(statement: FinancialStatement) -> "pd.DataFrame":
+    """Transactions as a columnar DataFrame, one column per Transaction field."""
+    # Imported here so callers that only extract statements don't pay for pandas
+    import pandas as pd
 
+    return pd.DataFrame.from_records(statement.transactions, columns=list(Transaction.__annotations__))
 
-def process_statement_with_attachments(pdf_path: str) -> FinancialStatement:
-    # Upload PDF to OpenAI
-    with open(pdf_path, "rb") as pdf_file:
-        uploaded_file = client.files.create(
-            file=pdf_file,
-            purpose="assistants"
-        )
 
-    # Process using Responses API
-    response = client.chat.completions.create(
+def parse_statements(content: str, expected: int) -> List[FinancialStatement]:
+    """Validate the model's JSON output and check it has one statement per file."""
+    try:
+        statements = BatchResult.model_validate_json(content).statements
+    except Exception as e:
+        raise RuntimeError(f"Extraction failed: {str(e)}")
+
+    if len(statements) != expected:
+        raise RuntimeError(f"Extraction failed: expected {expected} statements, got {len(statements)}")
+    return statements
+
+
+# In-process memo of statements already extracted or loaded this run
+_statement_memo: Dict[str, FinancialStatement] = {}
+
+
+async def load_cached_statement(digest: str) -> Optional[FinancialStatement]:
+    """Return a previously extracted statement for this PDF hash, if there is one."""
+    if digest in _statement_memo:
+        return _statement_memo[digest]
+
+    try:
+        content = await asyncio.to_thread(_read_file_bytes, os.path.join(STATEMENT_CACHE_DIR, f"{digest}.json"))
+    except FileNotFoundError:
+        return None
+    statement = FinancialStatement.model_validate_json(content)
+    _statement_memo[digest] = statement
+    return statement
+
+
+async def store_cached_statement(digest: str, statement: FinancialStatement) -> None:
+    """Persist an extracted statement under its PDF hash."""
+    _statement_memo[digest] = statement
+    await asyncio.to_thread(
+        _write_file_atomic, os.path.join(STATEMENT_CACHE_DIR, f"{digest}.json"), statement.model_dump_json().encode("utf-8")
+    )
+
+
+async def process_statements(pdf_paths: List[str]) -> List[FinancialStatement]:
+    """Extract every statement in pdf_paths with one completion request, skipping cached PDFs."""
+    # Read every PDF once, concurrently; the bytes serve both the cache key and the upload
+    pdf_contents = await asyncio.gather(*(read_pdf(pdf_path) for pdf_path in pdf_paths))
+    digests = [pdf_digest(pdf_bytes) for pdf_bytes in pdf_contents]
+    statements = list(await asyncio.gather(*(load_cached_statement(digest) for digest in digests)))
+    pending = [index for index, statement in enumerate(statements) if statement is None]
+    if not pending:
+        return statements
+
+    # Upload PDFs to OpenAI concurrently
+    file_ids = await asyncio.gather(*(upload_pdf(pdf_paths[index], pdf_contents[index]) for index in pending))
+
+    # Process all files in a single request
+    response = await get_client().chat.completions.create(
+        **build_completion_request(file_ids)
+    )
+
+    logger.debug("LLM raw response: %s", response.choices[0].message)
+    extracted = parse_statements(response.choices[0].message.content, len(pending))
+    for index, statement in zip(pending, extracted):
+        statements[index] = statement
+    await asyncio.gather(*(store_cached_statement(digests[index], statements[index]) for index in pending))
+    return statements
+
+
+async def process_statement_with_attachments(pdf_path: str) -> FinancialStatement:
+    return (await process_statements([pdf_path]))[0]
+
+
+_TRANSACTIONS_KEY_RE = re.compile(r'"transactions"\s*:\s*\[')
+
+
+class _TransactionArrayScanner:
+    """
+    Incrementally pick complete objects out of the first statement's "transactions" array.
+
+    Each character of the streamed output is looked at once, so finding rows stays linear
+    in the length of the statement instead of re-parsing everything received so far.
+    """
+
+    def __init__(self):
+        self._head = ""         # Output before the array opens, searched for its key
+        self._in_array = False
+        self._done = False
+        self._depth = 0         # Nesting depth inside the current row; 0 between rows
+        self._in_string = False
+        self._escape = False
+        self._row: List[str] = []  # Pieces of the row being read, across deltas
+
+    def feed(self, delta: str) -> List[str]:
+        """Consume the next chunk of output and return the JSON text of each row it completes."""
+        if self._done:
+            return []
+        if not self._in_array:
+            # Only the tail of the head can still be the start of a split key
+            search_from = max(0, len(self._head) - 32)
+            self._head += delta
+            match = _TRANSACTIONS_KEY_RE.search(self._head, search_from)
+            if match is None:
+                return []
+            self._in_array = True
+            delta, self._head = self._head[match.end():], ""
+
+        rows = []
+        start = 0 if self._depth else None  # Where the current row starts in this delta
+        for i, char in enumerate(delta):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # The array itself closed
+                    self._done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    self._row.append(delta[start:i + 1])
+                    rows.append("".join(self._row))
+                    self._row = []
+                    start = None
+        if self._depth and start is not None:
+            self._row.append(delta[start:])
+        return rows
+
+
+async def stream_statement_transactions(pdf_path: str, pdf_bytes: Optional[bytes] = None) -> AsyncIterator[Transaction]:
+    """
+    Extract one statement with a streamed completion, yielding transactions as they complete.
+
+    Rows are picked out of the output as soon as their closing brace arrives, so they can
+    be consumed while the rest of a long statement is still being generated. Pass
+    pdf_bytes when the PDF is already in memory (pdf_path then only names the upload).
+    """
+    file_id = await upload_pdf(pdf_path, pdf_bytes)
+    stream = await get_client().chat.completions.create(
+        **build_completion_request([file_id]),
+        stream=True
+    )
+
+    chunks = []
+    scanner = _TransactionArrayScanner()
+    emitted = 0
+    async for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        delta = chunk.choices[0].delta.content
+        chunks.append(delta)
+        for row in scanner.feed(delta):
+            yield transaction_adapter.validate_json(row)
+            emitted += 1
+
+    # Validate the complete document and emit anything the scanner did not
+    statement = parse_statements("".join(chunks), 1)[0]
+    for transaction in statement.transactions[emitted:]:
+        yield transaction
+
+
+async def analyze_statement(pdf_path: str) -> StatementAnalysis:
+    """
+    Extract and analyze a statement in a single completion request.
+
+    Saves the round-trip of extracting first and sending the result back for
+    analysis; the model sees the PDF once and returns both parts together.
+    """
+    file_id = await upload_pdf(pdf_path)
+
+    response = await get_client().chat.completions.create(
         model="gpt-4.1",
         messages=[
             {
                 "role": "system",
-                "content": """Analyze the attached financial document and extract structured data.
-                Follow these extraction rules:
-                1. Identify account holder information in document headers
-                2. Locate transaction tables with trade execution details
-                3. Convert all currency values to base currency
-                4. Map data fields to JSON schema precisely"""
+                "content": ANALYSIS_SYSTEM_PROMPT
             },
             {
                 "role": "user",
                 "content": [
-                    {"type": "text", "text": "Extract all account information and transactions from the attached statement in JSON format."},
-                    {
-                        "type": "file",
-                        "file": {
-                            "file_id": uploaded_file.id
-                        }
-                    }
+                    {"type": "text", "text": "Extract all account information and transactions from the attached statement and analyze them, in JSON format."},
+                    {"type": "file", "file": {"file_id": file_id}}
                 ]
             }
         ],
         response_format={
             "type": "json_schema",
             "json_schema": {
-                "name": 'statement_schema',
-                "description": 'Monthly statmement of InteractiveBrokers',
-                "schema": response_format_schema
+                "name": 'statement_analysis_schema',
+                "description": 'Monthly statement of InteractiveBrokers with an analysis of its activity',
+                "schema": analysis_format_schema()
             }
         }
     )
 
     try:
-        print(response.choices[0].message)
-        return FinancialStatement.model_validate_json(response.choices[0].message.content)
+        return StatementAnalysis.model_validate_json(response.choices[0].message.content)
     except Exception as e:
-        raise RuntimeError(f"Extraction failed: {str(e)}")
+        raise RuntimeError(f"Analysis failed: {str(e)}")
+
+
+async def run_batch(pdf_paths: List[str], max_concurrency: int = 4) -> List[FinancialStatement]:
+    """Extract each statement with its own request, running up to max_concurrency at once."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def process_one(pdf_path: str) -> FinancialStatement:
+        async with semaphore:
+            return await process_statement_with_attachments(pdf_path)
+
+    return await asyncio.gather(*(process_one(pdf_path) for pdf_path in pdf_paths))
+
+
+async def extract_statements_batch(pdf_paths: List[str], poll_interval: float = 30.0) -> List[FinancialStatement]:
+    """
+    Extract statements through the OpenAI Batch API.
+
+    Meant for large offline jobs: requests run at batch pricing within a 24h
+    window, so this polls until the batch finishes instead of returning quickly.
+    """
+    file_ids = await asyncio.gather(*(upload_pdf(pdf_path) for pdf_path in pdf_paths))
+
+    # One JSONL request line per PDF, with the same prompt and schema as process_statements
+    batch_lines = [
+        json.dumps({
+            "custom_id": str(index),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": build_completion_request([file_id])
+        })
+        for index, file_id in enumerate(file_ids)
+    ]
+    batch_input = await get_client().files.create(
+        file=("statement_batch.jsonl", "\n".join(batch_lines).encode("utf-8")),
+        purpose="batch"
+    )
+    batch = await get_client().batches.create(
+        input_file_id=batch_input.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(poll_interval)
+        batch = await get_client().batches.retrieve(batch.id)
+
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch extraction {batch.id} ended with status '{batch.status}'")
+
+    # Output lines can come back in any order; match them up by custom_id
+    output = await get_client().files.content(batch.output_file_id)
+    statements = [None] * len(pdf_paths)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        index = int(result["custom_id"])
+        if result.get("error") or result["response"]["status_code"] != 200:
+            raise RuntimeError(f"Extraction failed for {pdf_paths[index]}: {result.get('error') or result['response']['body']}")
+        content = result["response"]["body"]["choices"][0]["message"]["content"]
+        statements[index] = parse_statements(content, 1)[0]
+
+    missing = [pdf_path for pdf_path, statement in zip(pdf_paths, statements) if statement is None]
+    if missing:
+        raise RuntimeError(f"Extraction failed: no batch output for {', '.join(missing)}")
+    return statements
+
 
+if __name__ == "__main__":
+    # Example usage
+    statement_data = asyncio.run(process_statement_with_attachments("D:\\my-git-repos\\finance-news-agent\\InteractiveBrokers_Sample_Statement.pdf"))
+    # Serialize once for both the console and the output file
+    statement_json = statement_data.model_dump_json(indent=2)
+    print(statement_json)
 
-# Example usage
-statement_data = process_statement_with_attachments("D:\\my-git-repos\\finance-news-agent\\InteractiveBrokers_Sample_Statement.pdf")
-print(statement_data.model_dump_json(indent=2))
+    with open("InteractiveBrokers_Activity_Statement.json", "w", encoding="utf-8") as f:
+        f.write(statement_json)
 
-with open("InteractiveBrokers_Activity_Statement.json", "w") as f:
-    f.write(statement_data.model_dump_json(indent=2))
+    # Columnar copy of the transactions for aggregation by symbol/date
+    transactions_frame(statement_data).to_parquet("InteractiveBrokers_Activity_Statement.parquet", compression="zstd")
@@ -1,29 +1,85 @@
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
-from typing import List, Dict, Any
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from functools import lru_cache
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Literal, Optional
+import httpx
 import logging
+import tiktoken
 
 logger = logging.getLogger(__name__)
 
+# Prompt budget per article, in tokens of the analysis model
+ARTICLE_TOKEN_BUDGET = 256
+
+# Connection pool limits shared by every LLM client in the process
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+
+
+@lru_cache(maxsize=None)
+def get_llm(model_name: str = "gpt-4", temperature: float = 0.1, max_tokens: int = 2000) -> ChatOpenAI:
+    """Shared ChatOpenAI per configuration, so connections are reused across LLMService instances."""
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        http_client=httpx.Client(limits=HTTP_LIMITS),
+        http_async_client=httpx.AsyncClient(limits=HTTP_LIMITS)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_encoder() -> tiktoken.Encoding:
+    """Tokenizer for the analysis model, loaded on first use."""
+    return tiktoken.encoding_for_model("gpt-4")
+
+
+def truncate_to_tokens(text: str, max_tokens: int = ARTICLE_TOKEN_BUDGET) -> str:
+    """Cut text down to at most max_tokens tokens, on a token boundary."""
+    # Every token covers at least one character, so short texts already fit
+    if len(text) <= max_tokens:
+        return text
+    encoder = get_encoder()
+    tokens = encoder.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoder.decode(tokens[:max_tokens])
+
+
+class CompanyAnalysis(BaseModel):
+    """Structured news analysis for one company."""
+    symbol: str = Field(..., description="Stock symbol the analysis is for, exactly as given in the prompt")
+    sentiment: Literal["positive", "negative", "neutral"] = Field(..., description="Overall sentiment of the articles")
+    key_themes: List[str] = Field(..., description="Key themes and topics")
+    market_implications: str = Field(..., description="Market implications of the news")
+    risk_factors: List[str] = Field(..., description="Risk factors mentioned")
+    investment_considerations: List[str] = Field(..., description="Investment considerations")
+
+
+class BatchAnalysis(BaseModel):
+    """News analyses for several companies returned by a single LLM call."""
+    analyses: List[CompanyAnalysis] = Field(..., description="One analysis per company symbol in the prompt")
+
+
 class LLMService:
-    def __init__(self, model_name: str = "gpt-4", temperature: float = 0.1, max_tokens: int = 2000):
-        """Initialize the LLM service."""
-        self.llm = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+    def __init__(self, model_name: str = "gpt-4", temperature: float = 0.1, max_tokens: int = 2000,
+                 llm: Optional[ChatOpenAI] = None):
+        """Initialize the LLM service, reusing the shared client unless one is passed in."""
+        self.llm = llm or get_llm(model_name, temperature, max_tokens)
     
-    def analyze_news_articles(self, articles: List[Dict[str, Any]], company_symbol: str) -> Dict[str, Any]:
-        """Analyze news articles using the LLM."""
-        try:
-            # Prepare analysis prompt
-            articles_text = "\n\n".join([
-                f"Title: {article['title']}\nContent: {article['content'][:500]}..."
-                for article in articles[:5]  # Limit to top 5 articles
-            ])
-            
-            analysis_prompt = f"""
+    def _format_articles(self, articles: List[Dict[str, Any]]) -> str:
+        """Render the top articles as prompt text, using each article's pre-truncated snippet when present."""
+        return "\n\n".join([
+            f"Title: {article['title']}\nContent: {article.get('snippet') or truncate_to_tokens(article['content'])}..."
+            for article in articles[:5]  # Limit to top 5 articles
+        ])
+    
+    def _build_messages(self, articles: List[Dict[str, Any]], company_symbol: str) -> List[BaseMessage]:
+        """Build the analysis prompt for a company's news articles."""
+        # Prepare analysis prompt
+        articles_text = self._format_articles(articles)
+        
+        analysis_prompt = f"""
             Analyze the following financial news articles for {company_symbol}:
             
             {articles_text}
@@ -37,26 +93,99 @@ class LLMService:
             
             Format your response as a structured analysis.
             """
-            
+        
+        return [
+            SystemMessage(content="You are a financial news analyst. Provide objective, comprehensive analysis of news articles."),
+            HumanMessage(content=analysis_prompt)
+        ]
+    
+    def _build_result(self, response: BaseMessage, articles: List[Dict[str, Any]], company_symbol: str) -> Dict[str, Any]:
+        """Wrap the LLM response in the analysis result structure."""
+        return {
+            "analysis_type": "comprehensive_news_analysis",
+            "findings": {
+                "analysis_text": response.content,
+                "articles_analyzed": len(articles),
+                "company_symbol": company_symbol
+            },
+            "confidence_score": 0.8,  # Could be computed based on article quality/quantity
+            "model_version": "gpt-4"
+        }
+    
+    def analyze_news_articles(self, articles: List[Dict[str, Any]], company_symbol: str) -> Dict[str, Any]:
+        """Analyze news articles using the LLM."""
+        try:
             # Get LLM analysis
-            messages = [
-                SystemMessage(content="You are a financial news analyst. Provide objective, comprehensive analysis of news articles."),
-                HumanMessage(content=analysis_prompt)
-            ]
-            
-            response = self.llm.invoke(messages)
-            
-            return {
-                "analysis_type": "comprehensive_news_analysis",
-                "findings": {
-                    "analysis_text": response.content,
-                    "articles_analyzed": len(articles),
-                    "company_symbol": company_symbol
-                },
-                "confidence_score": 0.8,  # Could be computed based on article quality/quantity
-                "model_version": "gpt-4"
-            }
+            response = self.llm.invoke(self._build_messages(articles, company_symbol))
+            return self._build_result(response, articles, company_symbol)
             
         except Exception as e:
             logger.error(f"Error in LLM analysis: {e}")
-            raise 
\ No newline at end of file
+            raise
+    
+    async def aanalyze_news_articles(self, articles: List[Dict[str, Any]], company_symbol: str) -> Dict[str, Any]:
+        """Async variant of analyze_news_articles, so several analyses can run concurrently."""
+        try:
+            # Get LLM analysis without blocking the event loop
+            response = await self.llm.ainvoke(self._build_messages(articles, company_symbol))
+            return self._build_result(response, articles, company_symbol)
+            
+        except Exception as e:
+            logger.error(f"Error in LLM analysis: {e}")
+            raise
+    
+    def _build_batch_messages(self, articles_by_symbol: Dict[str, List[Dict[str, Any]]]) -> List[BaseMessage]:
+        """Build one analysis prompt covering the news articles of several companies."""
+        companies_text = "\n\n".join([
+            f"=== {company_symbol} ===\n{self._format_articles(articles)}"
+            for company_symbol, articles in articles_by_symbol.items()
+        ])
+        
+        analysis_prompt = f"""
+            Analyze the following financial news articles for each of these companies: {', '.join(articles_by_symbol)}
+            
+            {companies_text}
+            
+            For every company provide:
+            1. Overall sentiment (positive, negative, neutral)
+            2. Key themes and topics
+            3. Market implications
+            4. Risk factors mentioned
+            5. Investment considerations
+            
+            Return exactly one analysis per company, based only on that company's articles.
+            """
+        
+        return [
+            SystemMessage(content="You are a financial news analyst. Provide objective, comprehensive analysis of news articles."),
+            HumanMessage(content=analysis_prompt)
+        ]
+    
+    def analyze_news_articles_batch(self, articles_by_symbol: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Analyze the news articles of several companies with a single LLM call, keyed by symbol."""
+        try:
+            # Function calling works with every chat model, including the default gpt-4
+            structured_llm = self.llm.with_structured_output(BatchAnalysis, method="function_calling")
+            batch = structured_llm.invoke(self._build_batch_messages(articles_by_symbol))
+            analyses = {analysis.symbol.upper(): analysis for analysis in batch.analyses}
+            
+            results = {}
+            for company_symbol, articles in articles_by_symbol.items():
+                analysis = analyses.get(company_symbol.upper())
+                if analysis is None:
+                    raise ValueError(f"No analysis returned for {company_symbol}")
+                results[company_symbol] = {
+                    "analysis_type": "comprehensive_news_analysis",
+                    "findings": {
+                        **analysis.model_dump(exclude={"symbol"}),
+                        "articles_analyzed": len(articles),
+                        "company_symbol": company_symbol
+                    },
+                    "confidence_score": 0.8,
+                    "model_version": "gpt-4"
+                }
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error in batch LLM analysis: {e}")
+            raise
\ No newline at end of file
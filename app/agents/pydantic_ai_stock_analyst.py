@@ -5,65 +5,39 @@ Combines the MCP data pulling approach with structured graph workflow
 
 from __future__ import annotations
 import asyncio
+import contextlib
 import os
+from collections import deque
 from datetime import datetime
 from dataclasses import dataclass, field
-from typing import Optional, List, Literal
+from functools import lru_cache
+from typing import AsyncIterator, Deque, Optional, List, Union
 from pathlib import Path
 
-from pydantic import BaseModel, EmailStr
+import numpy as np
+from pydantic import TypeAdapter, ValidationError
 from pydantic_ai import Agent, RunContext
-from pydantic_ai.messages import ModelMessage
+from pydantic_ai.messages import ModelMessage, ModelRequest, ToolReturnPart
 from pydantic_graph import BaseNode, End, Graph, GraphRunContext
 from pydantic_ai.mcp import MCPServerStdio
 
-
-# --- Pydantic Models for Data Structures ---
-
-class StockDataPoint(BaseModel):
-    """Individual stock data point"""
-    date: str
-    symbol: str
-    open_price: float
-    high_price: float
-    low_price: float
-    close_price: float
-    volume: int
-    daily_change: Optional[float] = None
-    daily_change_pct: Optional[float] = None
+# The data models live in app.models so the API can use them without importing
+# the agent stack; they are re-exported here for existing imports.
+from app.models.stock_analysis import AnalysisResult, MarketConditions, StockDataPoint, UserProfile
 
 
-class MarketConditions(BaseModel):
-    """Current market conditions"""
-    sentiment: Literal["bullish", "bearish", "neutral"]
-    volatility: Literal["high", "medium", "low"]
-    trend: Literal["upward", "downward", "sideways"]
-    confidence: float  # 0-1
+# --- Pydantic Models for Data Structures ---
 
+# Validates a whole series of data points in a single call
+stock_data_points_adapter = TypeAdapter(List[StockDataPoint])
 
-class UserProfile(BaseModel):
-    """User investment profile"""
-    name: str = "Investor"
-    risk_tolerance: Literal["conservative", "moderate", "aggressive"] = "moderate"
-    investment_horizon: Literal["short", "medium", "long"] = "medium"
-    email: Optional[EmailStr] = None
 
+# --- Graph State Management ---
 
-class AnalysisResult(BaseModel):
-    """Final analysis result"""
-    symbol: str
-    recommendation: Literal["buy", "hold", "sell"]
-    confidence: float
-    target_price: Optional[float] = None
-    stop_loss: Optional[float] = None
-    reasoning: str
-    market_conditions: MarketConditions
-    data_points: List[StockDataPoint]
-    analysis_timestamp: datetime
+# Older messages fall off the histories so each agent call sends a bounded prompt
+MESSAGE_HISTORY_LIMIT = 40
 
 
-# --- Graph State Management ---
-
 @dataclass
 class StockAnalysisState:
     """State that flows through the analysis graph"""
@@ -75,14 +49,27 @@ class StockAnalysisState:
     fundamental_analysis: Optional[str] = None
     sentiment_analysis: Optional[str] = None
     final_result: Optional[AnalysisResult] = None
-    mcp_agent_messages: List[ModelMessage] = field(default_factory=list)
-    analysis_agent_messages: List[ModelMessage] = field(default_factory=list)
+    mcp_agent_messages: Deque[ModelMessage] = field(default_factory=lambda: deque(maxlen=MESSAGE_HISTORY_LIMIT))
+    analysis_agent_messages: Deque[ModelMessage] = field(default_factory=lambda: deque(maxlen=MESSAGE_HISTORY_LIMIT))
+
+
+def message_window(messages: Deque[ModelMessage]) -> List[ModelMessage]:
+    """Return the retained history, starting at a request that doesn't answer a dropped tool call"""
+    history = list(messages)
+    for i, message in enumerate(history):
+        if isinstance(message, ModelRequest) and not any(isinstance(part, ToolReturnPart) for part in message.parts):
+            return history[i:]
+    return []
 
 
 # --- MCP Setup ---
 
+@lru_cache(maxsize=1)
 def create_mcp_server() -> Optional[MCPServerStdio]:
-    """Create and configure the MCP server for stock data"""
+    """Create and configure the MCP server for stock data.
+    
+    Built once per process; call create_mcp_server.cache_clear() to pick up environment changes.
+    """
     try:
         # You'll need to adjust this path based on your actual MCP server location
         mcp_server_path = os.getenv('MCP_STOCK_SERVER_PATH', '/path/to/stock-mcp-server/dist/index.js')
@@ -92,8 +79,8 @@ def create_mcp_server() -> Optional[MCPServerStdio]:
             'node',
             args=[mcp_server_path],
             env={
-                'ALPHA_VANTAGE_API_KEY': api_key,
-                **os.environ
+                **os.environ,
+                'ALPHA_VANTAGE_API_KEY': api_key
             }
         )
     except Exception as e:
@@ -113,6 +100,15 @@ def create_agents():
         return None
     
     try:
+        from pydantic_ai.models.anthropic import AnthropicModelSettings
+        
+        # Cache the fixed prefix (tool definitions, then system prompt) of every request,
+        # so repeated runs are billed and processed as cache reads; user prompts stay uncached
+        cached_prefix_settings = AnthropicModelSettings(
+            anthropic_cache_tool_definitions=True,
+            anthropic_cache_instructions=True
+        )
+        
         mcp_server = create_mcp_server()
         mcp_servers = [mcp_server] if mcp_server else []
         
@@ -120,6 +116,7 @@ def create_agents():
         agents['data_agent'] = Agent(
             'anthropic:claude-3-5-sonnet-latest',
             deps_type=UserProfile,
+            model_settings=cached_prefix_settings,
             mcp_servers=mcp_servers,
             system_prompt="You are a data collection specialist. Use MCP tools to gather comprehensive stock data."
         )
@@ -128,6 +125,7 @@ def create_agents():
         agents['technical_agent'] = Agent(
             'anthropic:claude-3-5-sonnet-latest', 
             deps_type=UserProfile,
+            model_settings=cached_prefix_settings,
             system_prompt="You are a technical analysis expert. Analyze stock data patterns, trends, and technical indicators."
         )
         
@@ -135,6 +133,7 @@ def create_agents():
         agents['fundamental_agent'] = Agent(
             'anthropic:claude-3-5-sonnet-latest',
             deps_type=UserProfile, 
+            model_settings=cached_prefix_settings,
             system_prompt="You are a fundamental analysis expert. Evaluate company financials, market position, and intrinsic value."
         )
         
@@ -142,6 +141,7 @@ def create_agents():
         agents['sentiment_agent'] = Agent(
             'anthropic:claude-3-5-sonnet-latest',
             deps_type=UserProfile,
+            model_settings=cached_prefix_settings,
             system_prompt="You are a market sentiment analyst. Analyze news, social media, and market psychology indicators."
         )
         
@@ -150,6 +150,7 @@ def create_agents():
             'anthropic:claude-3-5-sonnet-latest',
             output_type=AnalysisResult,
             deps_type=UserProfile,
+            model_settings=cached_prefix_settings,
             system_prompt="You are a senior investment advisor. Synthesize all analysis to provide final investment recommendations."
         )
         
@@ -160,196 +161,319 @@ def create_agents():
         return None
 
 
-# Global agents (created lazily)
+# Global agents (created lazily). create_agents() may return None (no API key), so a
+# separate flag records that creation was attempted instead of retrying on every call
 _agents = None
+_agents_created = False
+_agents_lock = asyncio.Lock()
 
 def get_agents():
     """Get or create agents"""
-    global _agents
-    if _agents is None:
+    global _agents, _agents_created
+    if not _agents_created:
         _agents = create_agents()
+        _agents_created = True
     return _agents
 
 
+async def get_agents_async():
+    """Get or create agents without blocking the event loop.
+    
+    The first call builds the agents (importing the model SDKs) on a worker thread;
+    concurrent first callers wait on the lock instead of each building their own.
+    """
+    global _agents, _agents_created
+    if _agents_created:
+        return _agents
+    async with _agents_lock:
+        if not _agents_created:
+            _agents = await asyncio.to_thread(create_agents)
+            _agents_created = True
+    return _agents
+
+
+# Long-lived MCP session for the data agent, started by start_mcp_servers().
+# While it is open, analyses reuse the running MCP server process instead of
+# spawning a new one per run.
+_mcp_context = None
+_mcp_lock = asyncio.Lock()
+
+async def start_mcp_servers() -> bool:
+    """Start the data agent's MCP servers and keep them running until stop_mcp_servers()"""
+    global _mcp_context
+    agents = await get_agents_async()
+    if not agents or not agents.get('data_agent'):
+        return False
+    
+    async with _mcp_lock:
+        if _mcp_context is None:
+            context = agents['data_agent'].run_mcp_servers()
+            await context.__aenter__()
+            _mcp_context = context
+    return True
+
+
+async def stop_mcp_servers() -> None:
+    """Stop the MCP servers started by start_mcp_servers()"""
+    global _mcp_context
+    async with _mcp_lock:
+        context, _mcp_context = _mcp_context, None
+        if context is not None:
+            await context.__aexit__(None, None, None)
+
+
+# --- Mock Fallbacks ---
+
+def create_mock_data(symbol: str) -> List[StockDataPoint]:
+    """Create mock stock data for demonstration"""
+    base_price = 150.0
+    # Simple price variation, one per day
+    prices = [base_price + (i % 10) - 5 for i in range(30)]
+    
+    # Values are generated here, not external input, so validation is skipped
+    return [
+        StockDataPoint.model_construct(
+            date=f"2024-{12 - i//30:02d}-{(i % 30) + 1:02d}",
+            symbol=symbol,
+            open_price=price,
+            high_price=price + 2,
+            low_price=price - 2,
+            close_price=price + 1,
+            volume=1000000 + (i * 10000),
+            daily_change=1.5 if i % 2 == 0 else -0.8,
+            daily_change_pct=1.0 if i % 2 == 0 else -0.5
+        )
+        for i, price in enumerate(prices)
+    ]
+
+
+def create_mock_result(symbol: str) -> AnalysisResult:
+    """Create a mock analysis result for demonstration"""
+    return AnalysisResult(
+        symbol=symbol,
+        recommendation="hold",
+        confidence=0.75,
+        target_price=165.0,
+        stop_loss=135.0,
+        reasoning=f"Mock analysis for {symbol}: Based on combined technical, fundamental, and sentiment analysis, "
+                 f"the stock shows moderate potential with balanced risk. Recommendation is to hold for "
+                 f"medium-term investors. Note: This is a demonstration with mock data.",
+        market_conditions=MarketConditions(
+            sentiment="neutral",
+            volatility="medium",
+            trend="sideways",
+            confidence=0.6
+        ),
+        data_points=[],  # Will be updated with actual data
+        analysis_timestamp=datetime.now()
+    )
+
+
 # --- Graph Nodes ---
 
 @dataclass
 class DataCollection(BaseNode[StockAnalysisState]):
     """First node: Collect raw stock data using MCP"""
     
-    async def run(self, ctx: GraphRunContext[StockAnalysisState]) -> TechnicalAnalysis:
-        agents = get_agents()
+    async def run(self, ctx: GraphRunContext[StockAnalysisState]) -> AnalysisFanOut:
+        agents = await get_agents_async()
         
         if not agents or not agents.get('data_agent'):
             # Mock data collection when agents are not available
             print(f"Using mock data collection for {ctx.state.symbol}")
-            data_points = self._create_mock_data(ctx.state.symbol)
+            data_points = create_mock_data(ctx.state.symbol)
             ctx.state.raw_data = data_points
-            return TechnicalAnalysis()
+            return AnalysisFanOut()
+        
+        # Reuse the long-lived MCP session when one is running, otherwise start one for this run
+        mcp_session = contextlib.nullcontext() if _mcp_context is not None else agents['data_agent'].run_mcp_servers()
         
         try:
-            async with agents['data_agent'].run_mcp_servers():
+            async with mcp_session:
                 result = await agents['data_agent'].run(
                     f"Use get-daily-stock-data to collect comprehensive data for {ctx.state.symbol}. "
                     f"Get at least 30 days of historical data with open, high, low, close, and volume.",
                     deps=ctx.state.user_profile,
-                    message_history=ctx.state.mcp_agent_messages
+                    message_history=message_window(ctx.state.mcp_agent_messages)
                 )
                 
-                ctx.state.mcp_agent_messages += result.new_messages()
+                ctx.state.mcp_agent_messages.extend(result.new_messages())
                 
                 # Parse the MCP response into structured data
                 data_points = self._parse_mcp_data(result.output, ctx.state.symbol)
                 ctx.state.raw_data = data_points
                 
-                return TechnicalAnalysis()
+                return AnalysisFanOut()
                 
         except Exception as e:
             # Fallback to mock data on error
             print(f"Data collection failed: {e}. Using mock data.")
-            data_points = self._create_mock_data(ctx.state.symbol)
+            data_points = create_mock_data(ctx.state.symbol)
             ctx.state.raw_data = data_points
-            return TechnicalAnalysis()
-    
-    def _create_mock_data(self, symbol: str) -> List[StockDataPoint]:
-        """Create mock stock data for demonstration"""
-        data_points = []
-        base_price = 150.0
-        
-        for i in range(30):
-            date_str = f"2024-{12 - i//30:02d}-{(i % 30) + 1:02d}"
-            price_variance = (i % 10) - 5  # Simple price variation
-            
-            data_point = StockDataPoint(
-                date=date_str,
-                symbol=symbol,
-                open_price=base_price + price_variance,
-                high_price=base_price + price_variance + 2,
-                low_price=base_price + price_variance - 2,
-                close_price=base_price + price_variance + 1,
-                volume=1000000 + (i * 10000),
-                daily_change=1.5 if i % 2 == 0 else -0.8,
-                daily_change_pct=1.0 if i % 2 == 0 else -0.5
-            )
-            data_points.append(data_point)
-        
-        return data_points
+            return AnalysisFanOut()
     
     def _parse_mcp_data(self, mcp_output: str, symbol: str) -> List[StockDataPoint]:
         """Parse MCP output into structured data points"""
-        # This is a simplified implementation
-        # In practice, you'd parse the actual MCP JSON/CSV response
-        # For now, return mock data
-        return self._create_mock_data(symbol)
+        # A JSON array of data points is validated in one pass, straight from the raw text
+        payload = mcp_output.strip()
+        if payload.startswith("["):
+            try:
+                return stock_data_points_adapter.validate_json(payload)
+            except ValidationError as e:
+                print(f"Could not parse MCP data: {e}. Using mock data.")
+        
+        # Other formats (e.g. a prose summary) are not parsed yet; use mock data
+        return create_mock_data(symbol)
 
 
-@dataclass
-class TechnicalAnalysis(BaseNode[StockAnalysisState]):
-    """Second node: Perform technical analysis"""
+# --- Analysis Stages ---
+# Technical, fundamental and sentiment analysis each read only the collected data and the
+# user profile, so they are plain coroutines that AnalysisFanOut runs concurrently.
+
+def to_price_arrays(data_points: List[StockDataPoint]) -> dict:
+    """Column arrays (struct-of-arrays) of the data points for vectorized statistics"""
+    count = len(data_points)
     
-    async def run(self, ctx: GraphRunContext[StockAnalysisState]) -> FundamentalAnalysis:
-        agents = get_agents()
-        data_summary = self._prepare_data_summary(ctx.state.raw_data)
-        
-        if not agents or not agents.get('technical_agent'):
-            # Mock technical analysis
-            ctx.state.technical_analysis = f"Mock technical analysis for {ctx.state.symbol}: " \
-                                         f"Based on {len(ctx.state.raw_data)} data points, " \
-                                         f"the stock shows moderate bullish momentum with good volume support."
-            return FundamentalAnalysis()
-        
-        try:
-            result = await agents['technical_agent'].run(
-                f"Perform technical analysis for {ctx.state.symbol}. "
-                f"Analyze the following data for trends, support/resistance levels, "
-                f"moving averages, and momentum indicators:\n{data_summary}",
-                deps=ctx.state.user_profile
-            )
-            
-            ctx.state.technical_analysis = result.output
-            return FundamentalAnalysis()
-        except Exception as e:
-            # Fallback to mock analysis
-            print(f"Technical analysis failed: {e}. Using mock analysis.")
-            ctx.state.technical_analysis = f"Mock technical analysis for {ctx.state.symbol} (error fallback)"
-            return FundamentalAnalysis()
+    def column(field: str, dtype) -> np.ndarray:
+        return np.fromiter((getattr(point, field) for point in data_points), dtype=dtype, count=count)
     
-    def _prepare_data_summary(self, data_points: List[StockDataPoint]) -> str:
-        """Prepare a summary of the data for analysis"""
-        if not data_points:
-            return "No data available"
-        
-        latest = data_points[-1]
-        oldest = data_points[0]
-        
-        return f"""
+    return {
+        'close': column('close_price', np.float64),
+        'high': column('high_price', np.float64),
+        'low': column('low_price', np.float64),
+        'volume': column('volume', np.int64),
+    }
+
+
+def relative_strength_index(close: np.ndarray, period: int = 14) -> Optional[float]:
+    """Simple-average RSI over the last `period` price changes, or None if there is too little data"""
+    if len(close) <= period:
+        return None
+    changes = np.diff(close[-(period + 1):])
+    average_gain = changes.clip(min=0).mean()
+    average_loss = -changes.clip(max=0).mean()
+    if average_loss == 0:
+        return 100.0
+    return float(100 - 100 / (1 + average_gain / average_loss))
+
+
+def prepare_data_summary(data_points: List[StockDataPoint]) -> str:
+    """Prepare a summary of the data for analysis"""
+    if not data_points:
+        return "No data available"
+    
+    latest = data_points[-1]
+    oldest = data_points[0]
+    prices = to_price_arrays(data_points)
+    close = prices['close']
+    
+    # Indicators that need more history than is available are left out
+    indicators = []
+    for window in (20, 50):
+        if len(close) >= window:
+            indicators.append(f"- {window}-Day SMA: ${close[-window:].mean():.2f}")
+    rsi = relative_strength_index(close)
+    if rsi is not None:
+        indicators.append(f"- 14-Day RSI: {rsi:.1f}")
+    indicator_lines = "".join(f"{line}\n        " for line in indicators)
+    
+    return f"""
         Data Summary for {latest.symbol}:
         - Latest Price: ${latest.close_price:.2f}
         - Price Change: {latest.daily_change_pct:.2f}%
         - Period: {oldest.date} to {latest.date}
-        - Average Volume: {sum(d.volume for d in data_points) / len(data_points):,.0f}
-        - Data Points: {len(data_points)}
+        - Period High / Low: ${prices['high'].max():.2f} / ${prices['low'].min():.2f}
+        - Closing Price Std Dev: ${close.std():.2f}
+        - Average Volume: {prices['volume'].mean():,.0f}
+        {indicator_lines}- Data Points: {len(data_points)}
         """
 
 
-@dataclass  
-class FundamentalAnalysis(BaseNode[StockAnalysisState]):
-    """Third node: Perform fundamental analysis"""
+async def run_technical_analysis(state: StockAnalysisState, agents: Optional[dict]) -> str:
+    """Perform technical analysis"""
+    if not agents or not agents.get('technical_agent'):
+        # Mock technical analysis
+        return f"Mock technical analysis for {state.symbol}: " \
+               f"Based on {len(state.raw_data)} data points, " \
+               f"the stock shows moderate bullish momentum with good volume support."
     
-    async def run(self, ctx: GraphRunContext[StockAnalysisState]) -> SentimentAnalysis:
-        agents = get_agents()
-        
-        if not agents or not agents.get('fundamental_agent'):
-            # Mock fundamental analysis
-            ctx.state.fundamental_analysis = f"Mock fundamental analysis for {ctx.state.symbol}: " \
-                                           f"Company shows solid fundamentals with reasonable valuation " \
-                                           f"for {ctx.state.user_profile.risk_tolerance} risk tolerance."
-            return SentimentAnalysis()
-        
-        try:
-            result = await agents['fundamental_agent'].run(
-                f"Perform fundamental analysis for {ctx.state.symbol}. "
-                f"Consider the company's financial health, competitive position, "
-                f"growth prospects, and valuation metrics. "
-                f"User risk tolerance: {ctx.state.user_profile.risk_tolerance}",
-                deps=ctx.state.user_profile
-            )
-            
-            ctx.state.fundamental_analysis = result.output
-            return SentimentAnalysis()
-        except Exception as e:
-            print(f"Fundamental analysis failed: {e}. Using mock analysis.")
-            ctx.state.fundamental_analysis = f"Mock fundamental analysis for {ctx.state.symbol} (error fallback)"
-            return SentimentAnalysis()
+    data_summary = prepare_data_summary(state.raw_data)
+    result = await agents['technical_agent'].run(
+        f"Perform technical analysis for {state.symbol}. "
+        f"Analyze the following data for trends, support/resistance levels, "
+        f"moving averages, and momentum indicators:\n{data_summary}",
+        deps=state.user_profile
+    )
+    return result.output
+
+
+async def run_fundamental_analysis(state: StockAnalysisState, agents: Optional[dict]) -> str:
+    """Perform fundamental analysis"""
+    if not agents or not agents.get('fundamental_agent'):
+        # Mock fundamental analysis
+        return f"Mock fundamental analysis for {state.symbol}: " \
+               f"Company shows solid fundamentals with reasonable valuation " \
+               f"for {state.user_profile.risk_tolerance} risk tolerance."
+    
+    result = await agents['fundamental_agent'].run(
+        f"Perform fundamental analysis for {state.symbol}. "
+        f"Consider the company's financial health, competitive position, "
+        f"growth prospects, and valuation metrics. "
+        f"User risk tolerance: {state.user_profile.risk_tolerance}",
+        deps=state.user_profile
+    )
+    return result.output
+
+
+async def run_sentiment_analysis(state: StockAnalysisState, agents: Optional[dict]) -> str:
+    """Analyze market sentiment"""
+    if not agents or not agents.get('sentiment_agent'):
+        # Mock sentiment analysis
+        return f"Mock sentiment analysis for {state.symbol}: " \
+               f"Market sentiment appears moderately positive with stable outlook."
+    
+    result = await agents['sentiment_agent'].run(
+        f"Analyze current market sentiment for {state.symbol}. "
+        f"Consider news sentiment, social media buzz, analyst ratings, "
+        f"and overall market conditions affecting this stock.",
+        deps=state.user_profile
+    )
+    return result.output
 
 
 @dataclass
-class SentimentAnalysis(BaseNode[StockAnalysisState]):
-    """Fourth node: Analyze market sentiment"""
+class AnalysisFanOut(BaseNode[StockAnalysisState]):
+    """Second node: Run technical, fundamental and sentiment analysis concurrently"""
     
     async def run(self, ctx: GraphRunContext[StockAnalysisState]) -> FinalRecommendation:
-        agents = get_agents()
+        agents = await get_agents_async()
+        state = ctx.state
+        
+        # A failed stage falls back to its mock analysis without cancelling the others. A stage
+        # can also come back as a CancelledError, which is a BaseException, not an Exception.
+        technical, fundamental, sentiment = await asyncio.gather(
+            run_technical_analysis(state, agents),
+            run_fundamental_analysis(state, agents),
+            run_sentiment_analysis(state, agents),
+            return_exceptions=True
+        )
         
-        if not agents or not agents.get('sentiment_agent'):
-            # Mock sentiment analysis
-            ctx.state.sentiment_analysis = f"Mock sentiment analysis for {ctx.state.symbol}: " \
-                                         f"Market sentiment appears moderately positive with stable outlook."
-        else:
-            try:
-                result = await agents['sentiment_agent'].run(
-                    f"Analyze current market sentiment for {ctx.state.symbol}. "
-                    f"Consider news sentiment, social media buzz, analyst ratings, "
-                    f"and overall market conditions affecting this stock.",
-                    deps=ctx.state.user_profile
-                )
-                
-                ctx.state.sentiment_analysis = result.output
-            except Exception as e:
-                print(f"Sentiment analysis failed: {e}. Using mock analysis.")
-                ctx.state.sentiment_analysis = f"Mock sentiment analysis for {ctx.state.symbol} (error fallback)"
+        if isinstance(technical, BaseException):
+            print(f"Technical analysis failed: {technical}. Using mock analysis.")
+            technical = f"Mock technical analysis for {state.symbol} (error fallback)"
+        if isinstance(fundamental, BaseException):
+            print(f"Fundamental analysis failed: {fundamental}. Using mock analysis.")
+            fundamental = f"Mock fundamental analysis for {state.symbol} (error fallback)"
+        if isinstance(sentiment, BaseException):
+            print(f"Sentiment analysis failed: {sentiment}. Using mock analysis.")
+            sentiment = f"Mock sentiment analysis for {state.symbol} (error fallback)"
+        
+        state.technical_analysis = technical
+        state.fundamental_analysis = fundamental
+        state.sentiment_analysis = sentiment
         
         # Determine market conditions based on sentiment
-        ctx.state.market_conditions = MarketConditions(
+        state.market_conditions = MarketConditions(
             sentiment="bullish",  # This would be derived from actual sentiment analysis
             volatility="medium",
             trend="upward", 
@@ -364,43 +488,43 @@ class FinalRecommendation(BaseNode[StockAnalysisState, None, AnalysisResult]):
     """Final node: Generate investment recommendation"""
     
     async def run(self, ctx: GraphRunContext[StockAnalysisState]) -> End[AnalysisResult]:
-        agents = get_agents()
-        
-        # Combine all analyses
-        combined_analysis = f"""
-        Symbol: {ctx.state.symbol}
-        
-        Technical Analysis:
-        {ctx.state.technical_analysis or 'Not available'}
-        
-        Fundamental Analysis:  
-        {ctx.state.fundamental_analysis or 'Not available'}
-        
-        Sentiment Analysis:
-        {ctx.state.sentiment_analysis or 'Not available'}
-        
-        User Profile:
-        - Risk Tolerance: {ctx.state.user_profile.risk_tolerance}
-        - Investment Horizon: {ctx.state.user_profile.investment_horizon}
-        """
+        agents = await get_agents_async()
         
         if not agents or not agents.get('recommendation_agent'):
             # Create mock final result
-            final_result = self._create_mock_result(ctx.state.symbol, combined_analysis)
+            final_result = create_mock_result(ctx.state.symbol)
         else:
+            # Combine all analyses
+            combined_analysis = f"""
+            Symbol: {ctx.state.symbol}
+            
+            Technical Analysis:
+            {ctx.state.technical_analysis or 'Not available'}
+            
+            Fundamental Analysis:  
+            {ctx.state.fundamental_analysis or 'Not available'}
+            
+            Sentiment Analysis:
+            {ctx.state.sentiment_analysis or 'Not available'}
+            
+            User Profile:
+            - Risk Tolerance: {ctx.state.user_profile.risk_tolerance}
+            - Investment Horizon: {ctx.state.user_profile.investment_horizon}
+            """
+            
             try:
                 result = await agents['recommendation_agent'].run(
                     f"Based on the comprehensive analysis below, provide a final investment "
                     f"recommendation with specific price targets and risk management:\n{combined_analysis}",
                     deps=ctx.state.user_profile,
-                    message_history=ctx.state.analysis_agent_messages
+                    message_history=message_window(ctx.state.analysis_agent_messages)
                 )
                 
-                ctx.state.analysis_agent_messages += result.new_messages()
+                ctx.state.analysis_agent_messages.extend(result.new_messages())
                 final_result = result.output
             except Exception as e:
                 print(f"Final recommendation failed: {e}. Using mock result.")
-                final_result = self._create_mock_result(ctx.state.symbol, combined_analysis)
+                final_result = create_mock_result(ctx.state.symbol)
         
         # Ensure we have market conditions
         if not ctx.state.market_conditions:
@@ -418,44 +542,31 @@ class FinalRecommendation(BaseNode[StockAnalysisState, None, AnalysisResult]):
         
         ctx.state.final_result = final_result
         return End(final_result)
-    
-    def _create_mock_result(self, symbol: str, analysis: str) -> AnalysisResult:
-        """Create a mock analysis result for demonstration"""
-        return AnalysisResult(
-            symbol=symbol,
-            recommendation="hold",
-            confidence=0.75,
-            target_price=165.0,
-            stop_loss=135.0,
-            reasoning=f"Mock analysis for {symbol}: Based on combined technical, fundamental, and sentiment analysis, "
-                     f"the stock shows moderate potential with balanced risk. Recommendation is to hold for "
-                     f"medium-term investors. Note: This is a demonstration with mock data.",
-            market_conditions=MarketConditions(
-                sentiment="neutral",
-                volatility="medium",
-                trend="sideways",
-                confidence=0.6
-            ),
-            data_points=[],  # Will be updated with actual data
-            analysis_timestamp=datetime.now()
-        )
 
 
 # --- Main Graph Definition ---
 
+WORKFLOW_NODES = (DataCollection, AnalysisFanOut, FinalRecommendation)
+
 stock_analysis_graph = Graph(
-    nodes=[DataCollection, TechnicalAnalysis, FundamentalAnalysis, SentimentAnalysis, FinalRecommendation],
+    nodes=list(WORKFLOW_NODES),
     state_type=StockAnalysisState
 )
 
 
 # --- Main Analysis Class ---
 
+# A graph step (one node, usually one LLM call) taking longer than this is treated as hung
+ANALYSIS_STEP_TIMEOUT_SECONDS = 120.0
+
+
 class PydanticAIStockAnalyst:
     """Main class for the enhanced stock analyst with PydanticAI Graph"""
     
     def __init__(self):
         self.graph = stock_analysis_graph
+        self.workflow_nodes = WORKFLOW_NODES
+        self._mermaid_diagram: Optional[str] = None
     
     async def analyze_stock(
         self, 
@@ -473,17 +584,57 @@ class PydanticAIStockAnalyst:
             user_profile=user_profile
         )
         
+        # Without agents every node would fall back to mocks, so skip the graph entirely
+        if await get_agents_async() is None:
+            return self._fast_mock_result(state.symbol)
+        
         # Run the graph
         result = await self.graph.run(DataCollection(), state=state)
         
         return result.output
     
-    async def get_analysis_steps(
+    def _fast_mock_result(self, symbol: str) -> AnalysisResult:
+        """Build the result a mock graph run would produce, without running the graph"""
+        result = create_mock_result(symbol)
+        result.data_points = create_mock_data(symbol)
+        result.market_conditions = MarketConditions(
+            sentiment="bullish",
+            volatility="medium",
+            trend="upward",
+            confidence=0.75
+        )
+        return result
+    
+    async def analyze_stocks(
+        self,
+        symbols: List[str],
+        user_profile: Optional[UserProfile] = None,
+        concurrency: int = 8
+    ) -> List[Union[AnalysisResult, Exception]]:
+        """Analyze several stocks concurrently, at most `concurrency` at a time.
+        
+        Results are in the same order as `symbols`; a symbol whose analysis failed
+        gets its exception instead of a result.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def analyze_one(symbol: str) -> AnalysisResult:
+            # Each run builds its own StockAnalysisState, so nothing mutable is shared
+            async with semaphore:
+                return await self.analyze_stock(symbol, user_profile)
+        
+        return await asyncio.gather(*(analyze_one(symbol) for symbol in symbols), return_exceptions=True)
+    
+    async def stream_analysis_steps(
         self,
         symbol: str,
-        user_profile: Optional[UserProfile] = None
-    ) -> List[str]:
-        """Get a step-by-step breakdown of the analysis process"""
+        user_profile: Optional[UserProfile] = None,
+        step_timeout: float = ANALYSIS_STEP_TIMEOUT_SECONDS
+    ) -> AsyncIterator[str]:
+        """Yield each step of the analysis process as soon as its node is reached.
+        
+        Raises asyncio.TimeoutError if a single step takes longer than `step_timeout` seconds.
+        """
         
         if user_profile is None:
             user_profile = UserProfile()
@@ -493,16 +644,29 @@ class PydanticAIStockAnalyst:
             user_profile=user_profile  
         )
         
-        steps = []
         async with self.graph.iter(DataCollection(), state=state) as run:
-            async for node in run:
-                steps.append(f"{type(node).__name__}: {node}")
-        
-        return steps
+            nodes = aiter(run)
+            while True:
+                try:
+                    node = await asyncio.wait_for(anext(nodes), timeout=step_timeout)
+                except StopAsyncIteration:
+                    break
+                yield f"{type(node).__name__}: {node}"
+    
+    async def get_analysis_steps(
+        self,
+        symbol: str,
+        user_profile: Optional[UserProfile] = None
+    ) -> List[str]:
+        """Get a step-by-step breakdown of the analysis process"""
+        return [step async for step in self.stream_analysis_steps(symbol, user_profile)]
     
     def generate_mermaid_diagram(self) -> str:
         """Generate a Mermaid diagram of the analysis workflow"""
-        return self.graph.mermaid_code(start_node=DataCollection)
+        # The graph is fixed, so the diagram is generated once
+        if self._mermaid_diagram is None:
+            self._mermaid_diagram = self.graph.mermaid_code(start_node=DataCollection)
+        return self._mermaid_diagram
 
 
 # --- Usage Example ---
@@ -1,23 +1,87 @@
 from pydantic import BaseModel, Field
-from tavily import TavilyClient
+from tavily import AsyncTavilyClient, TavilyClient
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import logging
+import re
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Recent successful searches: {cache key: (expires_at, result)}
+_search_cache: Dict[Tuple, Tuple[float, Dict[str, Any]]] = {}
+_SEARCH_CACHE_MAX_ENTRIES = 256
+_WORD_RE = re.compile(r"\w+")
+
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Deep mode (include_raw_content=True) keeps at most this many characters of each page
+_RAW_CONTENT_MAX_CHARS = 4000
+
+def _search_cache_key(query: str, max_results: int, include_domains: Optional[List[str]],
+                      include_raw_content: bool = False) -> Tuple:
+    """
+    Cache key for a search. Case, punctuation and word order are ignored, so
+    "AAPL earnings news" and "news: aapl earnings" share an entry.
+    """
+    words = tuple(sorted(set(_WORD_RE.findall(query.lower()))))
+    return (words, max_results, tuple(sorted(include_domains or ())), include_raw_content)
+
 class TavilySearchToolInput(BaseModel):
     query: str = Field(description="Search query")
     max_results: int = Field(default=5, description="Maximum number of results")
     include_domains: Optional[List[str]] = Field(default=None, description="Domains to include in search")
 
-def search_tavily_news(query: str, max_results: int = 3, include_domains: Optional[List[str]] = None) -> Dict[str, Any]:
+# Shared clients (created on first use) so connections are reused across searches
+_client: Optional[TavilyClient] = None
+_async_client: Optional[AsyncTavilyClient] = None
+
+# Limits concurrent async searches to stay within Tavily rate limits
+_SEARCH_CONCURRENCY = 8
+_search_semaphore: Optional[asyncio.Semaphore] = None
+
+def get_client() -> TavilyClient:
+    """Get or create the shared Tavily client"""
+    global _client
+    if _client is None:
+        _client = TavilyClient()
+    return _client
+
+def get_async_client() -> AsyncTavilyClient:
+    """Get or create the shared async Tavily client"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncTavilyClient()
+    return _async_client
+
+def _get_cached_search(cache_key: Tuple) -> Optional[Dict[str, Any]]:
+    """Return an unexpired cached result for this search, if any."""
+    cached = _search_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+def _store_cached_search(cache_key: Tuple, result: Dict[str, Any], cache_ttl: float) -> None:
+    """Cache a successful search result for cache_ttl seconds."""
+    if not result["success"] or cache_ttl <= 0:
+        return
+    now = time.monotonic()
+    if len(_search_cache) >= _SEARCH_CACHE_MAX_ENTRIES:
+        # Drop expired entries, then the oldest ones if still full
+        for key in [key for key, (expires_at, _) in _search_cache.items() if expires_at <= now]:
+            del _search_cache[key]
+        while len(_search_cache) >= _SEARCH_CACHE_MAX_ENTRIES:
+            del _search_cache[next(iter(_search_cache))]
+    _search_cache.pop(cache_key, None)
+    _search_cache[cache_key] = (now + cache_ttl, result)
+
+def search_tavily_news(query: str, max_results: int = 3, include_domains: Optional[List[str]] = None,
+                       cache_ttl: float = 300, include_raw_content: bool = False) -> Dict[str, Any]:
     """
     Search for news articles using Tavily Search API.
     
@@ -25,69 +89,123 @@ def search_tavily_news(query: str, max_results: int = 3, include_domains: Option
         query: Search query string
         max_results: Maximum number of results to return
         include_domains: List of domains to include in search
+        cache_ttl: Seconds an equivalent earlier search is served from cache (0 disables)
+        include_raw_content: Deep mode; also fetch each page's full text (capped at
+            _RAW_CONTENT_MAX_CHARS) into metadata["raw_content"]. The default summary
+            mode returns titles and snippets only, a far smaller and faster response.
         
     Returns:
         Dictionary containing search results and metadata
     """
+    cache_key = _search_cache_key(query, max_results, include_domains, include_raw_content)
+    cached = _get_cached_search(cache_key)
+    if cached is not None:
+        logger.info("Serving cached Tavily results for: %s", query)
+        return cached
+    
     try:
-        logger.info(f"Searching Tavily for: {query}")
-        
-        client = TavilyClient()
-        
-        search_params = {
-            "query": query,
-            "search_depth": "advanced",
-            "max_results": max_results,
-            "include_answer": True,
-            "include_raw_content": True
-        }
-        
-        if include_domains:
-            search_params["include_domains"] = include_domains
-        
-        response = client.search(**search_params)
-        
-        articles = []
-        for item in response.get("results", []):
-            try:
-                # Extract publish date from content or use current time
-                published_at = datetime.now()
-                if "published" in item:
-                    try:
-                        published_at = datetime.fromisoformat(item["published"].replace("Z", "+00:00"))
-                    except:
-                        pass
-                
-                article = {
-                    "title": item.get("title", ""),
-                    "content": item.get("content", ""),
-                    "url": item.get("url", ""),
-                    "published_at": published_at,
-                    "source": "tavily",
-                    "metadata": {
-                        "score": item.get("score", 0),
-                        "raw_content": (item.get("raw_content") or "")#[:4000]  # Limit raw content
-                    }
-                }
-                articles.append(article)
-            except Exception as e:
-                logger.warning(f"Error processing Tavily search result: {e}")
-                continue
-        
-        return {
-            "success": True,
-            "articles": articles,
-            "total_found": len(articles),
-            "source": "tavily",
-            "answer": response.get("answer", ""),
-            "fetched_at": datetime.now().isoformat()
-        }
-        
+        logger.info("Searching Tavily for: %s", query)
+        response = get_client().search(**_build_search_params(query, max_results, include_domains, include_raw_content))
+        result = _build_search_result(response)
+    except Exception as e:
+        result = _search_error(query, e)
+    
+    _store_cached_search(cache_key, result, cache_ttl)
+    return result
+
+async def asearch_tavily_news(query: str, max_results: int = 3, include_domains: Optional[List[str]] = None,
+                              cache_ttl: float = 300, include_raw_content: bool = False) -> Dict[str, Any]:
+    """
+    Async variant of search_tavily_news, so searches don't block the event loop and
+    several can run concurrently (at most _SEARCH_CONCURRENCY at a time).
+    """
+    global _search_semaphore
+    cache_key = _search_cache_key(query, max_results, include_domains, include_raw_content)
+    cached = _get_cached_search(cache_key)
+    if cached is not None:
+        logger.info("Serving cached Tavily results for: %s", query)
+        return cached
+    
+    if _search_semaphore is None:
+        _search_semaphore = asyncio.Semaphore(_SEARCH_CONCURRENCY)
+    
+    try:
+        async with _search_semaphore:
+            logger.info("Searching Tavily for: %s", query)
+            response = await get_async_client().search(**_build_search_params(query, max_results, include_domains, include_raw_content))
+        result = _build_search_result(response)
     except Exception as e:
-        logger.error(f"Error searching Tavily for '{query}': {e}")
-        return {
-            "success": False,
-            "articles": [],
-            "error": str(e),
-            "source": "tavily"
-        }
\ No newline at end of file
+        result = _search_error(query, e)
+    
+    _store_cached_search(cache_key, result, cache_ttl)
+    return result
+
+def _build_search_params(query: str, max_results: int, include_domains: Optional[List[str]],
+                         include_raw_content: bool) -> Dict[str, Any]:
+    """Tavily search parameters for a news query."""
+    search_params = {
+        "query": query,
+        "search_depth": "advanced",
+        "max_results": max_results,
+        "include_answer": True,
+        "include_raw_content": include_raw_content
+    }
+    
+    if include_domains:
+        search_params["include_domains"] = include_domains
+    
+    return search_params
+
+def _parse_published(published: Any) -> Optional[datetime]:
+    """Parse an ISO 8601 publish date; None when missing or malformed."""
+    # Check the shape first so most bad values never reach the exception path
+    if not isinstance(published, str) or not _ISO_DATE_RE.match(published):
+        return None
+    try:
+        return datetime.fromisoformat(published[:-1] + "+00:00" if published.endswith("Z") else published)
+    except ValueError:
+        return None
+
+def _build_search_result(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a Tavily response into the search result structure."""
+    articles = []
+    # Articles without a usable publish date share one fallback timestamp
+    now = datetime.now()
+    for item in response.get("results", []):
+        try:
+            published_at = _parse_published(item.get("published")) or now
+            
+            article = {
+                "title": item.get("title", ""),
+                "content": item.get("content", ""),
+                "url": item.get("url", ""),
+                "published_at": published_at,
+                "source": "tavily",
+                "metadata": {
+                    "score": item.get("score", 0),
+                    "raw_content": (item.get("raw_content") or "")[:_RAW_CONTENT_MAX_CHARS]
+                }
+            }
+            articles.append(article)
+        except Exception as e:
+            logger.warning("Error processing Tavily search result: %s", e)
+            continue
+    
+    return {
+        "success": True,
+        "articles": articles,
+        "total_found": len(articles),
+        "source": "tavily",
+        "answer": response.get("answer", ""),
+        "fetched_at": datetime.now().isoformat()
+    }
+
+def _search_error(query: str, error: Exception) -> Dict[str, Any]:
+    """Search result structure for a failed search."""
+    logger.error("Error searching Tavily for '%s': %s", query, error)
+    return {
+        "success": False,
+        "articles": [],
+        "error": str(error),
+        "source": "tavily"
+    }
\ No newline at end of file
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from uuid import UUID
+from datetime import datetime
 from pydantic import BaseModel
-import json
+import orjson
 
-from app.database.connection import db_connection
 from app.database.repository import DatabaseRepository
+from app.api.deps import get_db_repository
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -15,12 +16,31 @@ class ChatSendRequest(BaseModel):
     user_id: UUID
 
 
-async def get_db_repository() -> DatabaseRepository:
-    """Dependency to get database repository"""
-    return await db_connection.get_repository()
+class ChartData(BaseModel):
+    type: Optional[str] = None
+    data: Optional[Any] = None
 
 
-@router.get("/history")
+class ChatHistoryItem(BaseModel):
+    id: UUID
+    message: Optional[str] = None
+    response: Optional[str] = None
+    has_chart: bool = False
+    created_at: datetime
+    chart: Optional[ChartData] = None
+
+
+class ChatHistoryResponse(BaseModel):
+    """Response model for chat history, serialized straight to JSON by Pydantic"""
+    status: str
+    chat_history: List[ChatHistoryItem]
+
+
+# ChatHistory fields copied into each history item
+CHAT_ITEM_FIELDS = {"id", "message", "response", "has_chart", "created_at"}
+
+
+@router.get("/history", response_model=ChatHistoryResponse)
 async def get_chat_history(
     user_id: UUID,
     limit: int = 50,
@@ -30,30 +50,30 @@ async def get_chat_history(
     try:
         chat_history = await db.chat_history.get_by_user_id(user_id, limit)
         
+        # Fetch every referenced chart in one query instead of one query per message.
+        # Read directly from the database to avoid Pydantic validation issues
+        chart_ids = list({chat.chart_id for chat in chat_history if chat.has_chart and chat.chart_id})
+        charts: Dict[UUID, Any] = {}
+        if chart_ids:
+            query = "SELECT id, type, data FROM charts WHERE id = ANY($1::uuid[])"
+            charts = {record['id']: record for record in await db.connection.fetch(query, chart_ids)}
+        
         # Build response with chart data when available
         response_data: List[Dict[str, Any]] = []
         for chat in chat_history:
-            chat_item: Dict[str, Any] = {
-                "id": chat.id,
-                "message": chat.message,
-                "response": chat.response,
-                "has_chart": chat.has_chart,
-                "created_at": chat.created_at
-            }
+            chat_item: Dict[str, Any] = chat.model_dump(include=CHAT_ITEM_FIELDS)
             
-            # If there's a chart associated, fetch and include the chart data
+            # If there's a chart associated, include the chart data
             if chat.has_chart and chat.chart_id:
-                # Get chart data directly from database to avoid Pydantic validation issues
-                query = "SELECT type, data FROM charts WHERE id = $1"
-                chart_record = await db.connection.fetchrow(query, chat.chart_id)
+                chart_record = charts.get(chat.chart_id)
                 
                 if chart_record:
                     chart_data = chart_record['data']
                     # Parse JSON string to dict if needed
                     if isinstance(chart_data, str):
                         try:
-                            chart_data = json.loads(chart_data)
-                        except json.JSONDecodeError:
+                            chart_data = orjson.loads(chart_data)
+                        except orjson.JSONDecodeError:
                             chart_data = None
                     
                     chat_item["chart"] = {
@@ -82,6 +102,6 @@ async def get_chat_history(
 async def send_message(
     request: ChatSendRequest,
     db: DatabaseRepository = Depends(get_db_repository)
-):
+) -> Dict[str, Any]:
     """Send message to agent and receive response"""
     return {"status": "ok", "message": "Chat send endpoint ready"} 
\ No newline at end of file
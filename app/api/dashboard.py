@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
+from typing import Any, Dict
 from uuid import UUID
 from pydantic import BaseModel
 
-from app.database.connection import db_connection
 from app.database.repository import DatabaseRepository
+from app.api.deps import get_db_repository
 
 router = APIRouter(tags=["dashboard"])
 
@@ -13,16 +14,11 @@ class ChartCreateRequest(BaseModel):
     data_request: str
 
 
-async def get_db_repository() -> DatabaseRepository:
-    """Dependency to get database repository"""
-    return await db_connection.get_repository()
-
-
 @router.get("/dashboard")
 async def get_user_charts(
     user_id: UUID,
     db: DatabaseRepository = Depends(get_db_repository)
-):
+) -> Dict[str, Any]:
     """List all user-generated charts"""
     return {"status": "ok", "message": "Dashboard charts endpoint ready"}
 
@@ -31,6 +27,6 @@ async def get_user_charts(
 async def create_chart(
     request: ChartCreateRequest,
     db: DatabaseRepository = Depends(get_db_repository)
-):
+) -> Dict[str, Any]:
     """Request generation of a new chart"""
     return {"status": "ok", "message": "Chart creation endpoint ready"} 
\ No newline at end of file
@@ -0,0 +1,10 @@
+from typing import AsyncIterator
+
+from app.database.connection import db_connection
+from app.database.repository import DatabaseRepository
+
+
+async def get_db_repository() -> AsyncIterator[DatabaseRepository]:
+    """Dependency to get database repository; its connection is released after the response"""
+    async with db_connection.get_repository() as repository:
+        yield repository
\ No newline at end of file
@@ -3,30 +3,69 @@ FastAPI endpoints for the PydanticAI Stock Analyst with Graph workflow
 """
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import TYPE_CHECKING, Any, Dict, Optional, List
 import asyncio
+import logging
+import time
+from functools import lru_cache
 from datetime import datetime
+from uuid import uuid4
 
-from app.agents.pydantic_ai_stock_analyst import (
-    PydanticAIStockAnalyst, 
+from app.models.stock_analysis import (
     UserProfile, 
     AnalysisResult,
     StockDataPoint,
     MarketConditions
 )
 
+if TYPE_CHECKING:
+    from app.agents.pydantic_ai_stock_analyst import PydanticAIStockAnalyst
+
 router = APIRouter(prefix="/stock-analysis", tags=["Stock Analysis"])
 
-# Global analyst instance
-analyst = PydanticAIStockAnalyst()
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
+def get_analyst() -> "PydanticAIStockAnalyst":
+    """Get the shared analyst instance, created on first use.
+    
+    The agent stack is imported here, so workers that never serve a stock analysis never load it.
+    """
+    from app.agents.pydantic_ai_stock_analyst import PydanticAIStockAnalyst
+    return PydanticAIStockAnalyst()
+
+SYMBOL_MAX_LENGTH = 10
+
+@lru_cache(maxsize=4096)
+def normalize_symbol(symbol: str) -> str:
+    """Strip and uppercase a stock symbol, raising ValueError if it is empty or too long.
+    
+    Requests reuse a small set of tickers, so results are cached; rejected symbols raise and are never stored.
+    """
+    symbol = symbol.strip().upper()
+    if not symbol:
+        raise ValueError("Stock symbol cannot be empty")
+    if len(symbol) > SYMBOL_MAX_LENGTH:
+        raise ValueError(f"Stock symbol must be at most {SYMBOL_MAX_LENGTH} characters")
+    return symbol
+
 
 # --- Request/Response Models ---
 
 class StockAnalysisRequest(BaseModel):
     """Request model for stock analysis"""
-    symbol: str = Field(..., description="Stock symbol (e.g., AAPL, GOOGL)", min_length=1, max_length=10)
+    # Whitespace is stripped before the length check, so a blank symbol is rejected at parse time
+    model_config = ConfigDict(str_strip_whitespace=True)
+    
+    symbol: str = Field(..., description="Stock symbol (e.g., AAPL, GOOGL)", min_length=1, max_length=SYMBOL_MAX_LENGTH)
     user_profile: Optional[UserProfile] = Field(None, description="User investment profile")
+    
+    @field_validator("symbol")
+    @classmethod
+    def _normalize_symbol_field(cls, symbol: str) -> str:
+        return normalize_symbol(symbol)
 
 
 class StockAnalysisResponse(BaseModel):
@@ -60,28 +99,20 @@ async def analyze_stock(request: StockAnalysisRequest):
     
     This endpoint runs a multi-stage analysis including:
     1. Data Collection (via MCP)
-    2. Technical Analysis
-    3. Fundamental Analysis  
-    4. Sentiment Analysis
-    5. Final Recommendation
+    2. Analysis Fan-Out: technical, fundamental and sentiment analysis run concurrently
+    3. Final Recommendation
     """
     
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
     try:
-        # Validate symbol
-        symbol = request.symbol.upper().strip()
-        if not symbol:
-            raise HTTPException(status_code=400, detail="Stock symbol cannot be empty")
-        
         # Use provided user profile or default
         user_profile = request.user_profile or UserProfile()
         
-        # Run the analysis
-        result = await analyst.analyze_stock(symbol, user_profile)
+        # Run the analysis (the symbol was already normalized when the request was parsed)
+        result = await get_analyst().analyze_stock(request.symbol, user_profile)
         
-        end_time = datetime.now()
-        execution_time = (end_time - start_time).total_seconds()
+        execution_time = time.perf_counter() - start_time
         
         return StockAnalysisResponse(
             success=True,
@@ -90,8 +121,7 @@ async def analyze_stock(request: StockAnalysisRequest):
         )
         
     except Exception as e:
-        end_time = datetime.now()
-        execution_time = (end_time - start_time).total_seconds()
+        execution_time = time.perf_counter() - start_time
         
         return StockAnalysisResponse(
             success=False,
@@ -110,15 +140,16 @@ async def get_analysis_steps(symbol: str, user_profile: Optional[UserProfile] =
     """
     
     try:
-        symbol = symbol.upper().strip()
-        if not symbol:
-            raise HTTPException(status_code=400, detail="Stock symbol cannot be empty")
+        try:
+            symbol = normalize_symbol(symbol)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         # Get analysis steps
-        steps = await analyst.get_analysis_steps(symbol, user_profile)
+        steps = await get_analyst().get_analysis_steps(symbol, user_profile)
         
         # Generate Mermaid diagram
-        mermaid_diagram = analyst.generate_mermaid_diagram()
+        mermaid_diagram = get_analyst().generate_mermaid_diagram()
         
         return AnalysisStepsResponse(
             success=True,
@@ -133,6 +164,51 @@ async def get_analysis_steps(symbol: str, user_profile: Optional[UserProfile] =
         )
 
 
+@router.get("/workflow-steps/{symbol}/stream")
+async def stream_analysis_steps(symbol: str):
+    """
+    Stream the analysis workflow steps for a given stock as server-sent events
+    
+    Each node execution is sent as soon as it is reached, so clients can show
+    progress while the remaining steps are still running.
+    """
+    
+    try:
+        symbol = normalize_symbol(symbol)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def events():
+        try:
+            async for step in get_analyst().stream_analysis_steps(symbol):
+                yield f"data: {step}\n\n"
+        except asyncio.TimeoutError:
+            yield "event: error\ndata: Analysis step timed out\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: Failed to get analysis steps: {str(e)}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@lru_cache(maxsize=1)
+def workflow_visualization() -> WorkflowVisualization:
+    """Build the workflow visualization once; the graph never changes"""
+    description = """
+    Stock Analysis Workflow:
+    1. DataCollection - Gather stock data via MCP
+    2. AnalysisFanOut - Run these concurrently:
+       - Technical analysis of price patterns and indicators
+       - Fundamental analysis of company financials and valuation
+       - Sentiment analysis of market sentiment and news
+    3. FinalRecommendation - Generate investment recommendation
+    """
+    
+    return WorkflowVisualization(
+        mermaid_diagram=get_analyst().generate_mermaid_diagram(),
+        description=description.strip()
+    )
+
+
 @router.get("/workflow-diagram", response_model=WorkflowVisualization)
 async def get_workflow_diagram():
     """
@@ -143,28 +219,13 @@ async def get_workflow_diagram():
     """
     
     try:
-        mermaid_diagram = analyst.generate_mermaid_diagram()
-        
-        description = """
-        Stock Analysis Workflow:
-        1. DataCollection - Gather stock data via MCP
-        2. TechnicalAnalysis - Analyze price patterns and indicators  
-        3. FundamentalAnalysis - Evaluate company financials and valuation
-        4. SentimentAnalysis - Assess market sentiment and news
-        5. FinalRecommendation - Generate investment recommendation
-        """
-        
-        return WorkflowVisualization(
-            mermaid_diagram=mermaid_diagram,
-            description=description.strip()
-        )
-        
+        return workflow_visualization()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate workflow diagram: {str(e)}")
 
 
 @router.post("/analyze-async")
-async def analyze_stock_async(request: StockAnalysisRequest, background_tasks: BackgroundTasks):
+async def analyze_stock_async(request: StockAnalysisRequest, background_tasks: BackgroundTasks) -> Dict[str, Any]:
     """
     Start stock analysis as a background task
     
@@ -172,8 +233,8 @@ async def analyze_stock_async(request: StockAnalysisRequest, background_tasks: B
     Use this for long-running analyses to avoid timeouts.
     """
     
-    # Generate a simple task ID
-    task_id = f"task_{request.symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    # Random suffix, so concurrent requests (and separate workers) never share an ID
+    task_id = f"task_{request.symbol}_{uuid4().hex[:12]}"
     
     # Add background task
     background_tasks.add_task(run_analysis_background, task_id, request)
@@ -192,35 +253,39 @@ async def run_analysis_background(task_id: str, request: StockAnalysisRequest):
     """Run stock analysis in the background"""
     
     try:
-        print(f"Starting background analysis {task_id} for {request.symbol}")
+        logger.info("Starting background analysis %s for %s", task_id, request.symbol)
+        start_time = time.perf_counter()
         
         user_profile = request.user_profile or UserProfile()
-        result = await analyst.analyze_stock(request.symbol, user_profile)
+        result = await get_analyst().analyze_stock(request.symbol, user_profile)
         
-        print(f"Background analysis {task_id} completed successfully")
-        print(f"Recommendation: {result.recommendation} (confidence: {result.confidence:.2f})")
+        logger.info(
+            "Background analysis %s completed successfully in %.2fs. Recommendation: %s (confidence: %.2f)",
+            task_id, time.perf_counter() - start_time, result.recommendation, result.confidence
+        )
         
         # In a real application, you'd store this result in a database or cache
         # For now, we just log it
         
     except Exception as e:
-        print(f"Background analysis {task_id} failed: {str(e)}")
+        logger.error("Background analysis %s failed: %s", task_id, e)
 
 
 # --- Health Check ---
 
 @router.get("/health")
-async def health_check():
+async def health_check() -> Dict[str, Any]:
     """Health check endpoint for the stock analysis service"""
     
     try:
         # Simple check to ensure the analyst is working
-        diagram = analyst.generate_mermaid_diagram()
+        analyst = get_analyst()
+        analyst.generate_mermaid_diagram()
         
         return {
             "status": "healthy",
             "service": "PydanticAI Stock Analyst",
-            "workflow_nodes": 5,
+            "workflow_nodes": len(analyst.workflow_nodes),
             "mcp_enabled": True,
             "timestamp": datetime.now().isoformat()
         }
@@ -231,42 +296,50 @@ async def health_check():
 
 # --- Example Usage ---
 
-@router.get("/examples")
-async def get_examples():
-    """Get example usage of the stock analysis API"""
-    
-    examples = {
-        "basic_analysis": {
-            "method": "POST",
-            "endpoint": "/stock-analysis/analyze",
-            "body": {
-                "symbol": "AAPL"
-            }
-        },
-        "custom_profile_analysis": {
-            "method": "POST", 
-            "endpoint": "/stock-analysis/analyze",
-            "body": {
-                "symbol": "TSLA",
-                "user_profile": {
-                    "name": "John Investor",
-                    "risk_tolerance": "aggressive",
-                    "investment_horizon": "short"
-                }
+# Static, so built once at import
+EXAMPLES = {
+    "basic_analysis": {
+        "method": "POST",
+        "endpoint": "/stock-analysis/analyze",
+        "body": {
+            "symbol": "AAPL"
+        }
+    },
+    "custom_profile_analysis": {
+        "method": "POST", 
+        "endpoint": "/stock-analysis/analyze",
+        "body": {
+            "symbol": "TSLA",
+            "user_profile": {
+                "name": "John Investor",
+                "risk_tolerance": "aggressive",
+                "investment_horizon": "short"
             }
-        },
-        "workflow_visualization": {
-            "method": "GET",
-            "endpoint": "/stock-analysis/workflow-diagram"
-        },
-        "analysis_steps": {
-            "method": "GET", 
-            "endpoint": "/stock-analysis/workflow-steps/GOOGL"
         }
+    },
+    "workflow_visualization": {
+        "method": "GET",
+        "endpoint": "/stock-analysis/workflow-diagram"
+    },
+    "analysis_steps": {
+        "method": "GET", 
+        "endpoint": "/stock-analysis/workflow-steps/GOOGL"
+    },
+    "analysis_steps_stream": {
+        "method": "GET",
+        "endpoint": "/stock-analysis/workflow-steps/GOOGL/stream"
     }
+}
+
+EXAMPLES_RESPONSE = {
+    "description": "PydanticAI Stock Analyst API Examples",
+    "examples": EXAMPLES,
+    "note": "This API uses PydanticAI graphs with MCP for comprehensive stock analysis"
+}
+
+
+@router.get("/examples")
+async def get_examples() -> Dict[str, Any]:
+    """Get example usage of the stock analysis API"""
     
-    return {
-        "description": "PydanticAI Stock Analyst API Examples",
-        "examples": examples,
-        "note": "This API uses PydanticAI graphs with MCP for comprehensive stock analysis"
-    } 
\ No newline at end of file
+    return EXAMPLES_RESPONSE 
\ No newline at end of file
@@ -1,15 +1,27 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
 from uuid import UUID
+import asyncio
+import orjson
 
-from app.database.connection import db_connection
 from app.database.repository import DatabaseRepository
+from app.api.deps import get_db_repository
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 
-async def get_db_repository() -> DatabaseRepository:
-    """Dependency to get database repository"""
-    return await db_connection.get_repository()
+# Parsed rows sent to the database per COPY
+UPLOAD_INSERT_BATCH_ROWS = 200
+
+
+def statement_datetime(value: str) -> Optional[datetime]:
+    """Parse a statement's 'Date/Time' value (e.g. "2024-03-15, 09:30:00"); None when unrecognized"""
+    try:
+        return datetime.fromisoformat(value.replace(", ", " "))
+    except ValueError:
+        return None
 
 
 @router.post("/upload")
@@ -17,9 +29,59 @@ async def upload_transactions_pdf(
     user_id: UUID,
     file: UploadFile = File(...),
     db: DatabaseRepository = Depends(get_db_repository)
-):
-    """Upload PDF of investment transactions and parse them"""
-    return {"status": "ok", "message": "Transaction upload endpoint ready"}
+) -> Dict[str, Any]:
+    """Upload PDF of investment transactions and parse them.
+    
+    Transactions are stored in batches while the statement is still being extracted:
+    each batch's COPY runs in the background while the next rows are parsed. The upload
+    is all-or-nothing: if extraction fails, no rows are kept.
+    """
+    # Imported here so the OpenAI client stack only loads in workers that parse statements
+    from app.agents.demo_pdf_transaction_extractor import stream_statement_transactions
+    
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    
+    # The upload is already spooled to a temporary file; the extractor sends its bytes to OpenAI
+    pdf_bytes = await file.read()
+    
+    inserted = 0
+    pending: Optional[asyncio.Task] = None
+    batch: List[Dict[str, Any]] = []
+    try:
+        # One transaction for the whole upload (each batch's own becomes a savepoint), so a
+        # failure part-way leaves nothing behind and the client can simply retry
+        async with db.connection.transaction():
+            try:
+                async for transaction in stream_statement_transactions(file.filename or "statement.pdf", pdf_bytes):
+                    batch.append({**transaction, "user_id": user_id, "date_time": statement_datetime(transaction["date_time"])})
+                    if len(batch) >= UPLOAD_INSERT_BATCH_ROWS:
+                        # One COPY at a time on the request's connection
+                        if pending is not None:
+                            inserted += len(await pending)
+                        pending = asyncio.create_task(db.transactions.bulk_insert(batch))
+                        batch = []
+                if pending is not None:
+                    inserted += len(await pending)
+                if batch:
+                    inserted += len(await db.transactions.bulk_insert(batch))
+            except BaseException:
+                # Let an in-flight COPY finish cancelling before rolling back and releasing the connection
+                if pending is not None:
+                    pending.cancel()
+                    await asyncio.gather(pending, return_exceptions=True)
+                raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to process transactions PDF: {str(e)}"
+        )
+    
+    return {"status": "ok", "transactions_inserted": inserted}
+
+
+# Rows encoded per chunk sent to the client
+TRANSACTIONS_CHUNK_ROWS = 256
 
 
 @router.get("")
@@ -27,5 +89,22 @@ async def get_transactions(
     user_id: UUID,
     db: DatabaseRepository = Depends(get_db_repository)
 ):
-    """Fetch all parsed transactions for a user"""
-    return {"status": "ok", "message": "Get transactions endpoint ready"} 
\ No newline at end of file
+    """Fetch all parsed transactions for a user.
+    
+    The JSON array is streamed from a database cursor, so memory use doesn't grow with
+    the number of transactions and the first rows reach the client before the query ends.
+    """
+    async def transactions_json() -> AsyncIterator[bytes]:
+        chunk = [b"["]
+        separator = b""
+        async for record in db.transactions.iter_by_user_id(user_id):
+            chunk.append(separator)
+            chunk.append(orjson.dumps(dict(record)))
+            separator = b","
+            if len(chunk) >= 2 * TRANSACTIONS_CHUNK_ROWS:
+                yield b"".join(chunk)
+                chunk = []
+        chunk.append(b"]")
+        yield b"".join(chunk)
+    
+    return StreamingResponse(transactions_json(), media_type="application/json") 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from datetime import datetime
 from uuid import UUID, uuid4
 import asyncpg
@@ -12,6 +12,11 @@ class Chart(BaseModel):
     type: Optional[str] = None
     data: Optional[Dict[str, Any]] = None
     created_at: datetime
+    
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "Chart":
+        """Build from a database row, skipping validation (asyncpg already returns the field types)"""
+        return cls.model_construct(**record)
 
 
 class ChatHistory(BaseModel):
@@ -22,6 +27,11 @@ class ChatHistory(BaseModel):
     has_chart: bool = False
     chart_id: Optional[UUID] = None
     created_at: datetime
+    
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "ChatHistory":
+        """Build from a database row, skipping validation (asyncpg already returns the field types)"""
+        return cls.model_construct(**record)
 
 
 class Transaction(BaseModel):
@@ -39,6 +49,11 @@ class Transaction(BaseModel):
     mtm_p_l: Optional[float] = None
     code: Optional[str] = None
     created_at: datetime
+    
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "Transaction":
+        """Build from a database row, skipping validation (asyncpg already returns the field types)"""
+        return cls.model_construct(**record)
 
 
 class ChartRepository:
@@ -56,7 +71,7 @@ class ChartRepository:
         record = await self.connection.fetchrow(query, chart_id, user_id, title, type, data)
         if record is None:
             raise ValueError("Failed to insert chart record")
-        return Chart(**{k: v for k, v in record.items()})
+        return Chart.from_record(record)
     
     async def get_by_id(self, chart_id: UUID) -> Optional[Chart]:
         """Get a chart by its ID"""
@@ -64,13 +79,13 @@ class ChartRepository:
         record = await self.connection.fetchrow(query, chart_id)
         if record is None:
             return None
-        return Chart(**{k: v for k, v in record.items()})
+        return Chart.from_record(record)
     
     async def get_by_user_id(self, user_id: UUID) -> List[Chart]:
         """Get all charts for a user"""
         query = "SELECT * FROM charts WHERE user_id = $1 ORDER BY created_at DESC"
         records = await self.connection.fetch(query, user_id)
-        return [Chart(**{k: v for k, v in record.items()}) for record in records]
+        return [Chart.from_record(record) for record in records]
 
 class ChatHistoryRepository:
     def __init__(self, connection: asyncpg.Connection):
@@ -88,15 +103,29 @@ class ChatHistoryRepository:
         record = await self.connection.fetchrow(query, history_id, user_id, message, response, has_chart, chart_id)
         if record is None:
             raise ValueError("Failed to insert chat history record")
-        return ChatHistory(**{k: v for k, v in record.items()})
+        return ChatHistory.from_record(record)
   
     async def get_by_user_id(self, user_id: UUID, limit: int = 50) -> List[ChatHistory]:
         """Get chat history for a user"""
-        query = "SELECT * FROM chat_history WHERE user_id = $1 ORDER BY created_at DESC LIMIT $2"
+        # Columns are listed explicitly so rows can be read by position, without a kwargs dict per row
+        query = """
+            SELECT id, user_id, message, response, has_chart, chart_id, created_at
+            FROM chat_history WHERE user_id = $1 ORDER BY created_at DESC LIMIT $2
+        """
         records = await self.connection.fetch(query, user_id, limit)
-        return [ChatHistory(**{k: v for k, v in record.items()}) for record in records]
+        return [
+            ChatHistory.model_construct(
+                id=r[0], user_id=r[1], message=r[2], response=r[3], has_chart=r[4], chart_id=r[5], created_at=r[6]
+            )
+            for r in records
+        ]
     
 
+# Insertable transaction columns, in table order
+TRANSACTION_COLUMNS = ("id", "user_id", "symbol", "date_time", "quantity", "trade_price", "close_price",
+                       "proceeds", "commission_fee", "basis", "realized_p_l", "mtm_p_l", "code")
+
+
 class TransactionRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
@@ -121,21 +150,42 @@ class TransactionRepository:
         )
         if record is None:
             raise ValueError("Failed to insert transaction record")
-        return Transaction(**{k: v for k, v in record.items()})
+        return Transaction.from_record(record)
     
     async def get_by_user_id(self, user_id: UUID) -> List[Transaction]:
         """Get all transactions for a user"""
         query = "SELECT * FROM transactions WHERE user_id = $1 ORDER BY date_time DESC"
         records = await self.connection.fetch(query, user_id)
-        return [Transaction(**{k: v for k, v in record.items()}) for record in records]
+        return [Transaction.from_record(record) for record in records]
+    
+    async def iter_by_user_id(self, user_id: UUID, prefetch: int = 500) -> AsyncIterator[asyncpg.Record]:
+        """Yield all transactions for a user through a server-side cursor, `prefetch` rows at a time.
+        
+        Cursors only live inside a transaction, so this needs an acquired connection rather than a pool.
+        """
+        query = "SELECT * FROM transactions WHERE user_id = $1 ORDER BY date_time DESC"
+        async with self.connection.transaction():
+            async for record in self.connection.cursor(query, user_id, prefetch=prefetch):
+                yield record
     
     async def bulk_insert(self, transactions: List[Dict[str, Any]]) -> List[Transaction]:
-        """Insert multiple transactions at once"""
-        inserted_transactions = []
-        for transaction_data in transactions:
-            transaction = await self.insert(**transaction_data)
-            inserted_transactions.append(transaction)
-        return inserted_transactions
+        """Insert multiple transactions at once.
+        
+        All rows are streamed in a single COPY and read back with one query, inside one
+        transaction, so this needs an acquired connection rather than a pool.
+        """
+        if not transactions:
+            return []
+        rows = [
+            (uuid4(), *(transaction_data.get(column) for column in TRANSACTION_COLUMNS[1:]))
+            for transaction_data in transactions
+        ]
+        transaction_ids = [row[0] for row in rows]
+        async with self.connection.transaction():
+            await self.connection.copy_records_to_table("transactions", records=rows, columns=TRANSACTION_COLUMNS)
+            records = await self.connection.fetch("SELECT * FROM transactions WHERE id = ANY($1::uuid[])", transaction_ids)
+        records_by_id = {record["id"]: record for record in records}
+        return [Transaction.from_record(records_by_id[transaction_id]) for transaction_id in transaction_ids]
     
 class DatabaseRepository:
     """Main repository class that provides access to all table repositories"""
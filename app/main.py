@@ -1,71 +1,151 @@
-from fastapi import FastAPI
+import asyncio
+import atexit
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+import logging
+import logging.handlers
+import orjson
+import os
+import queue
+import time
+from typing import Any, Dict, Optional, Tuple
 import uvicorn
-from app.services.agent_service import AgentService
-from app.models.messages import AgentMessage
+from app.services.agent_service import AgentService, AgentUnavailableError
+from app.models.messages import AgentMessage, MessageType
+from app.models.stock_analysis import UserProfile
 from app.api.chat import router as chat_router
-from app.api.stock_analysis import router as stock_analysis_router
+from app.api.stock_analysis import get_analyst, router as stock_analysis_router
+from app.database.connection import db_connection
+
+# Configure logging once for the whole app. Log calls only enqueue the record; the
+# listener thread formats and writes it. It starts together with the handler so the
+# queue is drained whether or not the ASGI lifespan runs, and is flushed at exit.
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logger = logging.getLogger(__name__)
+
+def create_agent_service() -> AgentService:
+    """Create the agent service with the test agents registered and connected"""
+    # Create the agent service
+    service = AgentService()
+    
+    # Register your agents
+    service.register_agent(
+        agent_id="agent1",
+        endpoint="http://localhost:8001/api/agent",
+        name="First Agent",
+        description="Handles initial processing",
+        capabilities=["text_analysis", "classification"]
+    )
+    
+    service.register_agent(
+        agent_id="agent2",
+        endpoint="http://localhost:8002/api/agent",
+        name="Second Agent",
+        description="Processes results from first agent",
+        capabilities=["summarization", "response_generation"]
+    )
+    
+    # Connect the agents
+    service.connect_agents("agent1", "agent2", "feeds_into")
+    
+    return service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up long-lived services for the lifetime of the app.
+    
+    Registers the test agents, keeps the stock analyst's MCP server running and closes
+    the agent HTTP client and database pool on shutdown. Set MCP_PERSISTENT_SESSION=false to start a fresh
+    MCP session per analysis instead.
+    """
+    app.state.agent_service = create_agent_service()
+    
+    # The analyst stack (anthropic, MCP) is only loaded here when the session is kept open
+    persistent_mcp = os.getenv("MCP_PERSISTENT_SESSION", "true").lower() != "false"
+    if persistent_mcp:
+        from app.agents.pydantic_ai_stock_analyst import start_mcp_servers
+        try:
+            await start_mcp_servers()
+        except Exception as e:
+            logger.warning("Could not start MCP servers: %s. Analyses will start their own sessions.", e)
+    try:
+        yield
+    finally:
+        if persistent_mcp:
+            from app.agents.pydantic_ai_stock_analyst import stop_mcp_servers
+            await stop_mcp_servers()
+        await app.state.agent_service.aclose()
+        await db_connection.disconnect()
+
 
 app = FastAPI(
     title="Agent Orchestration API",
     description="Enhanced API with PydanticAI Graph-based Stock Analysis",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Include the stock analysis router
 app.include_router(stock_analysis_router)
 
-# Add CORS middleware
-origins = [
+# Add CORS middleware. The middleware checks each request's origin against
+# ALLOW_ORIGINS, so it is a frozenset for constant-time lookups.
+ALLOW_ORIGINS = frozenset([
     "http://localhost:3000",  # React default port
     "http://localhost:5173",  # Vite default port
     "http://localhost:8080",  # Common development port
     "http://127.0.0.1:3000",
     "http://127.0.0.1:5173",
     "http://127.0.0.1:8080",
-]
+])
+ALLOW_METHODS = ("GET", "POST", "PUT", "DELETE")
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=origins,
+    allow_origins=ALLOW_ORIGINS,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_methods=ALLOW_METHODS,
     allow_headers=["*"],
 )
 
 # Include the chat router
 app.include_router(chat_router)
 
-@app.get("/")
-async def root():
-    return {
-        "message": "Welcome to the Enhanced Agent Orchestration API",
-        "features": [
-            "Traditional HTTP-based agent orchestration",
-            "PydanticAI Graph-based stock analysis with MCP",
-            "Interactive workflow visualization",
-            "Comprehensive financial analysis pipeline"
-        ],
-        "endpoints": {
-            "stock_analysis": "/stock-analysis",
-            "docs": "/docs",
-            "health": "/stock-analysis/health"
-        }
+ROOT_RESPONSE: Dict[str, Any] = {
+    "message": "Welcome to the Enhanced Agent Orchestration API",
+    "features": [
+        "Traditional HTTP-based agent orchestration",
+        "PydanticAI Graph-based stock analysis with MCP",
+        "Interactive workflow visualization",
+        "Comprehensive financial analysis pipeline"
+    ],
+    "endpoints": {
+        "stock_analysis": "/stock-analysis",
+        "docs": "/docs",
+        "health": "/stock-analysis/health"
     }
+}
+
+@app.get("/")
+async def root() -> Dict[str, Any]:
+    return ROOT_RESPONSE
 
 
 @app.get("/test-workflow")
-async def test_pydantic_ai_workflow():
+async def test_pydantic_ai_workflow() -> Dict[str, Any]:
     """Test the PydanticAI stock analysis workflow"""
     
     try:
-        from app.agents.pydantic_ai_stock_analyst import PydanticAIStockAnalyst, UserProfile
-        
-        # Create analyst instance
-        analyst = PydanticAIStockAnalyst()
-        
-        # Generate workflow diagram
-        diagram = analyst.generate_mermaid_diagram()
+        # The shared analyst caches its workflow diagram
+        diagram = get_analyst().generate_mermaid_diagram()
         
         # Create test user profile
         user_profile = UserProfile(
@@ -95,45 +175,37 @@ async def test_pydantic_ai_workflow():
         }
 
 
-@app.get("/test-agent-activation")
-async def test_agent_activation():
-    # Create the agent service
-    service = AgentService()
-    
-    # Register your agents
-    service.register_agent(
-        agent_id="agent1",
-        endpoint="http://localhost:8001/api/agent",
-        name="First Agent",
-        description="Handles initial processing",
-        capabilities=["text_analysis", "classification"]
-    )
-    
-    service.register_agent(
-        agent_id="agent2",
-        endpoint="http://localhost:8002/api/agent",
-        name="Second Agent",
-        description="Processes results from first agent",
-        capabilities=["summarization", "response_generation"]
-    )
-    
-    # Connect the agents
-    service.connect_agents("agent1", "agent2", "feeds_into")
-    
-    # Create a test message
-    test_message = AgentMessage(
-        content="This is a test message",
+def create_test_message() -> AgentMessage:
+    """Build the query sent through the test agents"""
+    return AgentMessage(
+        agent_id="test_api",
+        message_type=MessageType.QUERY,
+        content={"text": "This is a test message"},
         metadata={"source": "test_api"}
     )
+
+
+@app.get("/test-agent-activation")
+async def test_agent_activation(request: Request) -> Dict[str, Any]:
+    service: AgentService = request.app.state.agent_service
+    
+    test_message = create_test_message()
     
-    # Test the orchestration
+    # Test the orchestration. Unavailable agents and timeouts fail fast with a status
+    # the caller can retry on.
     try:
-        responses = await service.orchestrate("agent1", test_message, ["agent2"])
+        responses = await service.orchestrate(
+            "agent1", test_message, ["agent2"], total_deadline=service.ORCHESTRATION_DEADLINE_SECONDS
+        )
         return {
             "success": True,
             "message": f"Received {len(responses)} responses",
             "responses": [{"content": r.message.content if r.message else "No content"} for r in responses]
         }
+    except AgentUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         return {
             "success": False,
@@ -141,11 +213,53 @@ async def test_agent_activation():
         }
 
 
-# Health check for the entire application
-@app.get("/health")
-async def health_check():
-    """Overall health check for the application"""
+@app.get("/agent-graph")
+async def get_agent_graph(request: Request) -> Response:
+    """Return the registered agent graph; answers 304 when the client's ETag is current"""
+    service: AgentService = request.app.state.agent_service
+    body, etag = service.get_graph_json()
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+# Responses whose graph has more nodes than this are serialized in a worker thread
+LARGE_GRAPH_NODES = 50
+
+@app.get("/test-agent-activation/stream")
+async def stream_agent_activation(request: Request) -> StreamingResponse:
+    """Run the test orchestration, sending each agent response as an NDJSON line as soon as it arrives"""
+    service: AgentService = request.app.state.agent_service
+    
+    test_message = create_test_message()
+    
+    async def lines():
+        try:
+            async for response in service.orchestrate_stream(
+                "agent1", test_message, ["agent2"], total_deadline=service.ORCHESTRATION_DEADLINE_SECONDS
+            ):
+                # Every response embeds the agent graph; encode big ones off the event loop
+                if response.graph is not None and len(response.graph.nodes) > LARGE_GRAPH_NODES:
+                    yield await asyncio.to_thread(response.model_dump_json) + "\n"
+                else:
+                    yield response.model_dump_json() + "\n"
+        except AgentUnavailableError as e:
+            yield orjson.dumps({"success": False, "status_code": 503, "error": str(e)}).decode() + "\n"
+        except asyncio.TimeoutError as e:
+            yield orjson.dumps({"success": False, "status_code": 504, "error": str(e)}).decode() + "\n"
+        except Exception as e:
+            yield orjson.dumps({"success": False, "error": str(e)}).decode() + "\n"
     
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# Health probes poll often, so the last result is reused for this long
+HEALTH_CACHE_TTL_SECONDS = 30
+_health_cache: Optional[Tuple[float, Dict[str, Any]]] = None  # (monotonic time, payload)
+
+def _check_health() -> Dict[str, Any]:
+    """Build the health payload, checking that the stock analyst workflow loads"""
     health_status = {
         "status": "healthy",
         "timestamp": "2024-01-01T00:00:00Z",  # Will be updated by actual datetime
@@ -157,9 +271,7 @@ async def health_check():
     
     # Test PydanticAI workflow
     try:
-        from app.agents.pydantic_ai_stock_analyst import PydanticAIStockAnalyst
-        analyst = PydanticAIStockAnalyst()
-        analyst.generate_mermaid_diagram()  # Simple test
+        get_analyst().generate_mermaid_diagram()  # Simple test
         health_status["services"]["pydantic_ai_stock_analyst"] = "healthy"
     except Exception as e:
         health_status["services"]["pydantic_ai_stock_analyst"] = f"unhealthy: {str(e)}"
@@ -168,5 +280,37 @@ async def health_check():
     return health_status
 
 
+# Health check for the entire application
+@app.get("/health")
+async def health_check(response: Response, force: bool = False) -> Dict[str, Any]:
+    """Overall health check for the application.
+    
+    Results are cached for HEALTH_CACHE_TTL_SECONDS; pass ``force=true`` to run the checks again.
+    """
+    global _health_cache
+    
+    now = time.monotonic()
+    if not force and _health_cache is not None and now - _health_cache[0] < HEALTH_CACHE_TTL_SECONDS:
+        response.headers["X-Cache"] = "HIT"
+    else:
+        _health_cache = (now, _check_health())
+        response.headers["X-Cache"] = "MISS"
+    response.headers["Cache-Control"] = f"max-age={HEALTH_CACHE_TTL_SECONDS}"
+    
+    return _health_cache[1]
+
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # DEV=1 runs a single auto-reloading process; otherwise run one worker per CPU
+    # (override with WEB_CONCURRENCY). uvicorn[standard] supplies uvloop and httptools.
+    if os.getenv("DEV") == "1":
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+        )
\ No newline at end of file
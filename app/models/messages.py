@@ -2,7 +2,11 @@ from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 from enum import Enum
-import uuid
+import secrets
+
+def new_id() -> str:
+    """Random 128-bit id as 32 hex chars; cheaper than building and formatting a uuid.UUID"""
+    return secrets.token_hex(16)
 
 class MessageType(str, Enum):
     QUERY = "query"
@@ -12,7 +16,7 @@ class MessageType(str, Enum):
     ERROR = "error"
 
 class AgentMessage(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     agent_id: str
     message_type: MessageType
     content: Dict[str, Any]
@@ -20,26 +24,26 @@ class AgentMessage(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
     
 class AgentNode(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     node_type: str
     properties: Dict[str, Any]
     metadata: Optional[Dict[str, Any]] = None
 
 class AgentEdge(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     source_id: str
     target_id: str
     edge_type: str
     properties: Optional[Dict[str, Any]] = None
 
 class AgentGraph(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     nodes: List[AgentNode] = []
     edges: List[AgentEdge] = []
     metadata: Optional[Dict[str, Any]] = None
 
 class AgentResponse(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     request_id: str
     message: Optional[AgentMessage] = None
     graph: Optional[AgentGraph] = None
@@ -0,0 +1,53 @@
+"""
+Data models for the PydanticAI stock analyst.
+
+Kept free of agent/graph imports so API modules can use them without loading the
+analysis stack.
+"""
+
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, EmailStr
+
+
+class StockDataPoint(BaseModel):
+    """Individual stock data point"""
+    date: str
+    symbol: str
+    open_price: float
+    high_price: float
+    low_price: float
+    close_price: float
+    volume: int
+    daily_change: Optional[float] = None
+    daily_change_pct: Optional[float] = None
+
+
+class MarketConditions(BaseModel):
+    """Current market conditions"""
+    sentiment: Literal["bullish", "bearish", "neutral"]
+    volatility: Literal["high", "medium", "low"]
+    trend: Literal["upward", "downward", "sideways"]
+    confidence: float  # 0-1
+
+
+class UserProfile(BaseModel):
+    """User investment profile"""
+    name: str = "Investor"
+    risk_tolerance: Literal["conservative", "moderate", "aggressive"] = "moderate"
+    investment_horizon: Literal["short", "medium", "long"] = "medium"
+    email: Optional[EmailStr] = None
+
+
+class AnalysisResult(BaseModel):
+    """Final analysis result"""
+    symbol: str
+    recommendation: Literal["buy", "hold", "sell"]
+    confidence: float
+    target_price: Optional[float] = None
+    stop_loss: Optional[float] = None
+    reasoning: str
+    market_conditions: MarketConditions
+    data_points: List[StockDataPoint]
+    analysis_timestamp: datetime
\ No newline at end of file
@@ -1,11 +1,39 @@
-from typing import Dict, List, Any, Optional
+import asyncio
+import hashlib
+import time
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple, Union
 import httpx
 from app.models.messages import AgentMessage, AgentGraph, AgentNode, AgentEdge, AgentResponse
 
+class AgentUnavailableError(Exception):
+    """Raised without contacting an agent whose recent calls kept failing"""
+
 class AgentService:
+    # Circuit breaker: after this many consecutive failures an agent is skipped until
+    # CIRCUIT_RECOVERY_SECONDS have passed since the last one, then tried again
+    CIRCUIT_FAILURE_THRESHOLD = 3
+    CIRCUIT_RECOVERY_SECONDS = 60.0
+    # Default time budget for a whole orchestration, shared by all of its hops
+    ORCHESTRATION_DEADLINE_SECONDS = 5.0
+    
     def __init__(self):
         self.agents: Dict[str, str] = {}  # agent_id -> endpoint_url
         self.graph = AgentGraph(nodes=[], edges=[])
+        self._nodes_by_id: Dict[str, AgentNode] = {}  # agent_id -> node in self.graph.nodes
+        self._graph_json: Optional[Tuple[bytes, str]] = None  # (serialized graph, ETag); reset when the graph changes
+        # Shared client so forwarded messages reuse pooled keep-alive connections. Agents that
+        # speak HTTP/2 get concurrent requests multiplexed over a single connection. Agent
+        # traffic is server-to-server, so proxy and certificate environment variables are ignored.
+        self._client = httpx.AsyncClient(
+            trust_env=False,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+                retries=0
+            ),
+            timeout=httpx.Timeout(60.0)
+        )
+        self._failures: Dict[str, Tuple[int, float]] = {}  # agent_id -> (consecutive failures, monotonic time of last)
         
     def register_agent(self, agent_id: str, endpoint: str, name: str, description: str, capabilities: List[str]) -> None:
         """Register an agent with the service"""
@@ -14,64 +42,160 @@ class AgentService:
         # Add to graph
         node = AgentNode(
             id=agent_id,
-            name=name,
-            description=description,
-            capabilities=capabilities
+            node_type="agent",
+            properties={
+                "name": name,
+                "description": description,
+                "capabilities": capabilities
+            }
         )
+        # Re-registering an agent replaces its node rather than adding a duplicate
+        previous = self._nodes_by_id.get(agent_id)
+        if previous is not None:
+            self.graph.nodes.remove(previous)
+        self._nodes_by_id[agent_id] = node
         self.graph.nodes.append(node)
+        self._graph_json = None
         
     def connect_agents(self, source_id: str, target_id: str, relationship: str) -> None:
         """Create a connection between two agents"""
-        if source_id not in self.agents or target_id not in self.agents:
+        if source_id not in self._nodes_by_id or target_id not in self._nodes_by_id:
             raise ValueError("Both source and target agents must be registered")
             
         edge = AgentEdge(
-            source=source_id,
-            target=target_id,
-            relationship=relationship
+            source_id=source_id,
+            target_id=target_id,
+            edge_type=relationship
         )
         self.graph.edges.append(edge)
+        self._graph_json = None
         
-    async def send_message(self, agent_id: str, message: AgentMessage) -> AgentResponse:
-        """Send a message to an agent and get the response"""
+    async def send_message(
+        self,
+        agent_id: str,
+        message: AgentMessage,
+        payload: Optional[bytes] = None,
+        timeout: Optional[float] = None
+    ) -> AgentResponse:
+        """Send a message to an agent and get the response.
+        
+        ``payload`` is the message's already serialized JSON, if the caller has it. ``timeout``
+        bounds the whole call in seconds, on top of the client's own 60 s timeout.
+        """
         if agent_id not in self.agents:
             raise ValueError(f"Agent {agent_id} is not registered")
+        
+        failures, last_failure = self._failures.get(agent_id, (0, 0.0))
+        if failures >= self.CIRCUIT_FAILURE_THRESHOLD and time.monotonic() - last_failure < self.CIRCUIT_RECOVERY_SECONDS:
+            raise AgentUnavailableError(f"Agent {agent_id} is unavailable after {failures} consecutive failures")
             
         endpoint = self.agents[agent_id]
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                endpoint,
-                json=message.model_dump(),
-                timeout=60.0  # Adjust timeout as needed
+        # Serialize/parse in pydantic-core rather than via dicts and the stdlib json module
+        if payload is None:
+            payload = message.model_dump_json().encode()
+        try:
+            response = await asyncio.wait_for(
+                self._client.post(
+                    endpoint,
+                    content=payload,
+                    headers={"Content-Type": "application/json"}
+                ),
+                timeout
             )
             
             if response.status_code != 200:
                 raise Exception(f"Error from agent {agent_id}: {response.text}")
-                
-            return AgentResponse(
-                request_id=message.id,
-                message=AgentMessage(**response.json()),
-                graph=self.graph
-            )
+            
+            reply = AgentMessage.model_validate_json(response.content)
+        except Exception:
+            # Re-read the count: concurrent calls to this agent may have failed meanwhile
+            self._failures[agent_id] = (self._failures.get(agent_id, (0, 0.0))[0] + 1, time.monotonic())
+            raise
+        
+        self._failures.pop(agent_id, None)
+        return AgentResponse(
+            request_id=message.id,
+            message=reply,
+            graph=self.graph
+        )
+        
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and its pooled connections"""
+        await self._client.aclose()
         
     def get_graph(self) -> AgentGraph:
         """Return the current agent graph"""
         return self.graph
     
+    def get_graph_json(self) -> Tuple[bytes, str]:
+        """Return the agent graph as JSON together with an ETag of it, serializing only after changes"""
+        if self._graph_json is None:
+            body = self.graph.model_dump_json().encode()
+            self._graph_json = (body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"')
+        return self._graph_json
+    
 
-    async def orchestrate(self, start_agent_id: str, message: AgentMessage, path: List[str]) -> List[AgentResponse]:
-        """Orchestrate a message through a path of agents"""
-        responses = []
+    async def orchestrate_stream(
+        self,
+        start_agent_id: str,
+        message: AgentMessage,
+        path: List[Union[str, List[str]]],
+        total_deadline: Optional[float] = None
+    ) -> AsyncIterator[AgentResponse]:
+        """Orchestrate a message through a path of agents, yielding each response as its hop completes.
+        
+        A nested list in ``path`` is a parallel stage: its agents all receive the current
+        message concurrently and their replies are not fed forward. ``total_deadline`` caps
+        the whole orchestration in seconds (ORCHESTRATION_DEADLINE_SECONDS by default); each
+        hop only gets the time that is left.
+        """
         current_message = message
+        payload = None  # Serialized current_message, shared by every hop that sends it
+        if total_deadline is None:
+            total_deadline = self.ORCHESTRATION_DEADLINE_SECONDS
+        deadline = time.monotonic() + total_deadline
         
-        for agent_id in [start_agent_id] + path:
-            response = await self.send_message(agent_id, current_message)
-            responses.append(response)
+        for stage in [start_agent_id] + path:
+            if payload is None:
+                payload = current_message.model_dump_json().encode()
+            
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise asyncio.TimeoutError("Orchestration deadline exceeded")
+            
+            if isinstance(stage, list):
+                stage_responses = await asyncio.gather(
+                    *(self.send_message(agent_id, current_message, payload, timeout) for agent_id in stage),
+                    return_exceptions=True
+                )
+                for response in stage_responses:
+                    if isinstance(response, asyncio.TimeoutError):
+                        raise asyncio.TimeoutError("Orchestration deadline exceeded") from response
+                    if isinstance(response, BaseException):
+                        raise response
+                for response in stage_responses:
+                    yield response
+                continue
+            
+            try:
+                response = await self.send_message(stage, current_message, payload, timeout)
+            except asyncio.TimeoutError as e:
+                raise asyncio.TimeoutError("Orchestration deadline exceeded") from e
+            yield response
             if response.message:  # Use response message as input to next agent
                 current_message = response.message
-                
-        return responses
+                payload = None
+    
+    async def orchestrate(
+        self,
+        start_agent_id: str,
+        message: AgentMessage,
+        path: List[Union[str, List[str]]],
+        total_deadline: Optional[float] = None
+    ) -> List[AgentResponse]:
+        """Orchestrate a message through a path of agents"""
+        return [response async for response in self.orchestrate_stream(start_agent_id, message, path, total_deadline)]
 
 async def test_agent_activation():
     # Create the agent service
@@ -110,4 +234,6 @@ async def test_agent_activation():
         return True
     except Exception as e:
         print(f"Activation failed: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+    finally:
+        await service.aclose()
\ No newline at end of file
@@ -37,10 +37,12 @@ CREATE TABLE transactions (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create indexes for better performance
-CREATE INDEX idx_chat_history_user_id ON chat_history(user_id);
+-- Create indexes for better performance.
+-- Per-user lists filter on user_id and sort newest first, so these composite
+-- indexes return rows already in order (and also serve plain user_id lookups).
+CREATE INDEX idx_chat_history_user_created ON chat_history(user_id, created_at DESC);
 CREATE INDEX idx_chat_history_created_at ON chat_history(created_at);
-CREATE INDEX idx_transactions_user_id ON transactions(user_id);
+CREATE INDEX idx_transactions_user_date ON transactions(user_id, date_time DESC);
 CREATE INDEX idx_transactions_symbol ON transactions(symbol);
 CREATE INDEX idx_transactions_date_time ON transactions(date_time);
-CREATE INDEX idx_charts_user_id ON charts(user_id);
+CREATE INDEX idx_charts_user_created ON charts(user_id, created_at DESC);
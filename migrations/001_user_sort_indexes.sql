@@ -0,0 +1,11 @@
+-- Composite indexes matching the repositories' per-user queries
+-- (WHERE user_id = $1 ORDER BY <timestamp> DESC), for databases created from an
+-- older init-db.sql. CONCURRENTLY avoids locking writes; run outside a transaction.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_user_date ON transactions(user_id, date_time DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_user_created ON chat_history(user_id, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_charts_user_created ON charts(user_id, created_at DESC);
+
+-- The single-column user_id indexes are covered by the composite ones above
+DROP INDEX CONCURRENTLY IF EXISTS idx_transactions_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_chat_history_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_charts_user_id;
\ No newline at end of file